@@ -35,34 +35,21 @@ def print_board(board):
     print(np.flip(board, 0))
 
 
-def winning_move(board, piece):
-    # Check horizontal locations for win
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT):
-            if board[r][c] == piece and board[r][c + 1] == piece and board[r][c + 2] == piece and board[r][
-                c + 3] == piece:
-                return True
-
-    # Check vertical locations for win
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT - 3):
-            if board[r][c] == piece and board[r + 1][c] == piece and board[r + 2][c] == piece and board[r + 3][
-                c] == piece:
-                return True
-
-    # Check positively sloped diaganols
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT - 3):
-            if board[r][c] == piece and board[r + 1][c + 1] == piece and board[r + 2][c + 2] == piece and board[r + 3][
-                c + 3] == piece:
-                return True
-
-    # Check negatively sloped diaganols
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(3, ROW_COUNT):
-            if board[r][c] == piece and board[r - 1][c + 1] == piece and board[r - 2][c + 2] == piece and board[r - 3][
-                c + 3] == piece:
-                return True
+# Function to check only the lines through the piece just dropped at (row, col)
+def winning_move_at(board, row, col):
+    piece = board[row][col]
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        for step in (1, -1):
+            r = row + step * dr
+            c = col + step * dc
+            while 0 <= r < ROW_COUNT and 0 <= c < COLUMN_COUNT and board[r][c] == piece and count < 4:
+                count += 1
+                r += step * dr
+                c += step * dc
+        if count >= 4:
+            return True
+    return False
 
 
 def draw_board(board):
@@ -132,7 +119,7 @@ while not game_over:
                     row = get_next_open_row(board, col)
                     drop_piece(board, row, col, 1)
 
-                    if winning_move(board, 1):
+                    if winning_move_at(board, row, col):
                         label = myfont.render("Player 1 wins!!", 1, RED)
                         screen.blit(label, (40, 10))
                         game_over = True
@@ -147,7 +134,7 @@ while not game_over:
                     row = get_next_open_row(board, col)
                     drop_piece(board, row, col, 2)
 
-                    if winning_move(board, 2):
+                    if winning_move_at(board, row, col):
                         label = myfont.render("Player 2 wins!!", 1, YELLOW)
                         screen.blit(label, (40, 10))
                         game_over = True
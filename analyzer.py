@@ -0,0 +1,131 @@
+# Offline analysis of archived games.
+#
+# The input has one game per line as a move string ("4453...", 1-based
+# columns, player 1 first); blank lines and lines starting with # are
+# skipped. Games are read as a stream and handed to a process pool. Each
+# worker replays its game move by move and searches every position before
+# a move, to a fixed depth or for a time budget. Every game becomes one
+# JSON line holding the played, best and value of each ply, in input order.
+# Only a few games per worker are in flight at a time, so memory stays
+# bounded however long the input is.
+#
+#     python analyzer.py games.txt --depth 8 -o annotated.jsonl
+#     python analyzer.py - --time 200 --workers 4 < games.txt
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import COLUMN_COUNT, Position
+from search import MAX_DEPTH, iterative_deepening, minimax, terminal_value
+from transposition import TranspositionTable
+
+# Per-side table size; each game starts with empty tables, so its results
+# do not depend on which worker it lands on
+ANALYZER_TABLE_BYTES = 8 * 1024 * 1024
+
+# Games queued per worker before the reader waits for results
+IN_FLIGHT_PER_WORKER = 4
+
+
+# (line number, moves) of every game in the lines
+def read_games(lines):
+    for number, line in enumerate(lines, 1):
+        moves = line.strip()
+        if moves and not moves.startswith("#"):
+            yield number, moves
+
+
+# Annotation of one game: for every ply the position is not over at, the
+# column played there (None after the last move), the best column and its
+# value for the side to move, and the depth searched. Columns are 1-based
+# like the input.
+def analyse_game(task):
+    number, moves, depth, time_ms = task
+    record = {"line": number, "moves": moves, "plies": []}
+    position = Position()
+    # One table per side to move, see search.Searcher
+    tables = {1: TranspositionTable(ANALYZER_TABLE_BYTES), 2: TranspositionTable(ANALYZER_TABLE_BYTES)}
+    start = time.perf_counter()
+    for ply in range(len(moves) + 1):
+        played = None
+        if ply < len(moves):
+            played = int(moves[ply]) - 1 if moves[ply].isdigit() else -1
+            if not 0 <= played < COLUMN_COUNT or not position.can_play(played):
+                record["error"] = "invalid move %r at ply %d" % (moves[ply], ply)
+                break
+        if terminal_value(position, position.turn) is not None:
+            if played is not None:
+                record["error"] = "move after the end of the game at ply %d" % ply
+            break
+        tt = tables[position.turn]
+        if time_ms is not None:
+            column, value, reached = iterative_deepening(position, time_ms, tt=tt, max_depth=depth or MAX_DEPTH)
+        else:
+            column, value = minimax(position, depth, tt=tt)
+            reached = depth
+        record["plies"].append({
+            "ply": ply,
+            "played": None if played is None else played + 1,
+            "best": column + 1,
+            "value": value,
+            "depth": reached,
+        })
+        if played is not None:
+            position.play(played)
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+# Annotate every game of lines and write one JSON line per game to out, in
+# input order. Returns (games, positions) analysed.
+def run(lines, out, depth=None, time_ms=None, workers=None):
+    if depth is None and time_ms is None:
+        raise ValueError("give a depth or a time budget")
+    workers = workers or os.cpu_count() or 1
+    games = positions = 0
+    pending = deque()
+    with ProcessPoolExecutor(workers) as executor:
+        for number, moves in read_games(lines):
+            pending.append(executor.submit(analyse_game, (number, moves, depth, time_ms)))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                positions += _write(pending.popleft().result(), out)
+                games += 1
+        while pending:
+            positions += _write(pending.popleft().result(), out)
+            games += 1
+    return games, positions
+
+
+def _write(record, out):
+    out.write(json.dumps(record) + "\n")
+    return len(record["plies"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search every position of archived games.")
+    parser.add_argument("input", help="file with one move string per line, or - for stdin")
+    parser.add_argument("-o", "--output", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--depth", type=int, help="search depth (with --time: the deepest iteration)")
+    parser.add_argument("--time", type=int, dest="time_ms", help="time budget per position in milliseconds")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+    if args.depth is None and args.time_ms is None:
+        parser.error("give --depth, --time or both")
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    sink = sys.stdout if args.output is None else open(args.output, "w")
+    started = time.perf_counter()
+    try:
+        total_games, total_positions = run(source, sink, args.depth, args.time_ms, args.workers)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    print("%d games, %d positions in %.1fs" % (total_games, total_positions, time.perf_counter() - started),
+          file=sys.stderr)
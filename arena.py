@@ -0,0 +1,253 @@
+# Engine-vs-engine matches with no GUI.
+#
+# Each game starts from a few random moves (seeded, so a match can be
+# replayed, and no opening used twice) and is played twice with the same
+# opening, once with each engine moving first. Games run on a process
+# pool. Results are win/draw/loss counts from the first engine's point of
+# view, an Elo difference estimated from them, and the time each move took.
+#
+#     python arena.py "depth=4" "depth=5" --games 20
+#     python arena.py "time=200" "time=200,weights=100:6:2:-5:6" --workers 4 --opening-plies 6
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import DEFAULT_WEIGHTS, Position, has_four
+from search import MAX_DEPTH, iterative_deepening, minimax, terminal_value
+from transposition import TranspositionTable
+
+# Random plies played before the engines take over; fixed-depth engines
+# play the same game from the same opening, so this bounds how many
+# different games a match can have (at most COLUMN_COUNT ** plies openings)
+OPENING_PLIES = 4
+
+# Per-side table size; every game gets fresh tables
+ARENA_TABLE_BYTES = 4 * 1024 * 1024
+
+
+# How an engine picks its moves: a fixed depth, a time budget per move
+# (iterative deepening, optionally capped at depth), eval weights in the
+# order of bitboard.DEFAULT_WEIGHTS, and the empty-cell count below which
+# the exact solver takes over (time budget only)
+class EngineConfig:
+
+    def __init__(self, name=None, depth=None, time_ms=None, weights=None, endgame_cells=0):
+        if depth is None and time_ms is None:
+            raise ValueError("an engine needs a depth or a time budget")
+        if weights is not None and len(weights) != len(DEFAULT_WEIGHTS):
+            raise ValueError("weights need %d values, got %d" % (len(DEFAULT_WEIGHTS), len(weights)))
+        self.depth = depth
+        self.time_ms = time_ms
+        self.weights = tuple(weights) if weights is not None else None
+        self.endgame_cells = endgame_cells
+        self.name = name or self.describe()
+
+    def describe(self):
+        parts = []
+        if self.depth is not None:
+            parts.append("depth=%d" % self.depth)
+        if self.time_ms is not None:
+            parts.append("time=%d" % self.time_ms)
+        if self.weights is not None:
+            parts.append("weights=%s" % ":".join(str(w) for w in self.weights))
+        if self.endgame_cells:
+            parts.append("endgame=%d" % self.endgame_cells)
+        return ",".join(parts)
+
+    def choose_move(self, position, tt):
+        if self.time_ms is not None:
+            column, _, _ = iterative_deepening(position, self.time_ms, tt=tt,
+                                               max_depth=self.depth or MAX_DEPTH,
+                                               endgame_cells=self.endgame_cells, weights=self.weights)
+            return column
+        return minimax(position, self.depth, tt=tt, weights=self.weights)[0]
+
+
+# EngineConfig from a spec such as "depth=4,weights=100:5:2:-4:6"
+def parse_engine(spec):
+    options = {}
+    for item in spec.split(","):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if key == "depth":
+            options["depth"] = int(value)
+        elif key == "time":
+            options["time_ms"] = int(value)
+        elif key == "weights":
+            options["weights"] = [int(w) for w in value.split(":")]
+        elif key == "endgame":
+            options["endgame_cells"] = int(value)
+        elif key == "name":
+            options["name"] = value
+        else:
+            raise ValueError("unknown engine option %r in %r" % (key, spec))
+    return EngineConfig(**options)
+
+
+# Random moves, or None when they end the game (a four or a full board)
+def random_opening(seed, plies=OPENING_PLIES):
+    rng = random.Random(seed)
+    position = Position()
+    moves = []
+    for _ in range(plies):
+        col = rng.choice(position.valid_moves())
+        position.play(col)
+        moves.append(col)
+        if terminal_value(position, position.turn) is not None:
+            return None
+    return moves
+
+
+# Openings of plies moves that do not end the game, counted up to limit
+def count_openings(plies, limit):
+    count = 0
+    stack = [(Position(), plies)]
+    while stack and count < limit:
+        position, left = stack.pop()
+        if left == 0:
+            count += 1
+            continue
+        for col in position.valid_moves():
+            child = position.copy()
+            child.play(col)
+            if terminal_value(child, child.turn) is None:
+                stack.append((child, left - 1))
+    return count
+
+
+# pairs different openings, drawn from the seeds seed, seed + 1, ... and
+# skipping repeats and openings that end the game. When there are fewer
+# possible openings than pairs the openings are reused, with a warning,
+# since repeated games say nothing new.
+def distinct_openings(pairs, seed=0, plies=OPENING_PLIES):
+    seen = set()
+    openings = []
+    attempt = 0
+    available = count_openings(plies, pairs)
+    while len(openings) < available and attempt < 100 * pairs:
+        moves = random_opening(seed + attempt, plies)
+        attempt += 1
+        if moves is not None and tuple(moves) not in seen:
+            seen.add(tuple(moves))
+            openings.append(moves)
+    if not openings:
+        raise ValueError("no opening of %d plies leaves the game going" % plies)
+    if len(openings) < pairs:
+        warnings.warn("only %d distinct openings of %d plies for %d pairs; games will repeat"
+                      % (len(openings), plies, pairs))
+        openings = [openings[i % len(openings)] for i in range(pairs)]
+    return openings
+
+
+# Play one game; engines[0] moves first after the opening. The result is
+# 1, 2 for the engine that won (by its index plus one) or 0 for a draw.
+def play_game(engines, opening):
+    position = Position()
+    for col in opening:
+        position.play(col)
+    tables = [TranspositionTable(ARENA_TABLE_BYTES), TranspositionTable(ARENA_TABLE_BYTES)]
+    # Engine to move next, counted from the first engine after the opening
+    side = 0
+    timings = [[], []]
+    moves = list(opening)
+    winner = 0
+    while terminal_value(position, position.turn) is None:
+        start = time.perf_counter()
+        col = engines[side].choose_move(position, tables[side])
+        timings[side].append(time.perf_counter() - start)
+        position.play(col)
+        moves.append(col)
+        if has_four(position.boards[2 - position.turn]):
+            winner = side + 1
+            break
+        side = 1 - side
+    return {"winner": winner, "moves": "".join(str(c + 1) for c in moves), "timings": timings}
+
+
+def _play_pairing(args):
+    first, second, opening, swapped = args
+    engines = (second, first) if swapped else (first, second)
+    result = play_game(engines, opening)
+    # Report everything from the first engine's side
+    if swapped:
+        result["winner"] = {0: 0, 1: 2, 2: 1}[result["winner"]]
+        result["timings"] = result["timings"][::-1]
+    result["first_moved"] = 2 if swapped else 1
+    return result
+
+
+# Elo difference of the first engine and its 95% margin, from its score
+def elo(wins, draws, losses):
+    games = wins + draws + losses
+    if not games:
+        return 0.0, 0.0
+    score = (wins + draws / 2.0) / games
+    # Keep a perfect score finite
+    score = min(max(score, 0.5 / games), 1 - 0.5 / games)
+    # + 0.0 turns the -0.0 of an even score into 0.0
+    diff = -400 * math.log10(1 / score - 1) + 0.0
+    deviation = math.sqrt(score * (1 - score) / games)
+    low = min(max(score - 1.96 * deviation, 1e-6), 1 - 1e-6)
+    high = min(max(score + 1.96 * deviation, 1e-6), 1 - 1e-6)
+    margin = (-400 * math.log10(1 / high - 1) + 400 * math.log10(1 / low - 1)) / 2
+    return diff, margin
+
+
+# Two games per opening, one with each engine moving first
+def run_match(first, second, pairs, workers=None, seed=0, opening_plies=OPENING_PLIES):
+    tasks = []
+    for opening in distinct_openings(pairs, seed, opening_plies):
+        tasks.append((first, second, opening, False))
+        tasks.append((first, second, opening, True))
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1) as executor:
+        games = list(executor.map(_play_pairing, tasks))
+    wins = sum(1 for g in games if g["winner"] == 1)
+    losses = sum(1 for g in games if g["winner"] == 2)
+    draws = len(games) - wins - losses
+    diff, margin = elo(wins, draws, losses)
+    return {
+        "engines": [first.name, second.name],
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "elo": diff,
+        "elo_margin": margin,
+        "games": games,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play two engine configurations against each other.")
+    parser.add_argument("first", help='engine spec, e.g. "depth=4" or "time=200,weights=100:5:2:-4:6"')
+    parser.add_argument("second", help="engine spec of the opponent")
+    parser.add_argument("--games", type=int, default=20, help="number of games, rounded up to an even number")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random openings")
+    parser.add_argument("--opening-plies", type=int, default=OPENING_PLIES,
+                        help="random plies before the engines take over (default: %d)" % OPENING_PLIES)
+    parser.add_argument("--json", help="write every game to this file")
+    args = parser.parse_args()
+
+    try:
+        engines = [parse_engine(args.first), parse_engine(args.second)]
+    except ValueError as e:
+        parser.error(str(e))
+    match = run_match(engines[0], engines[1], (args.games + 1) // 2, args.workers, args.seed,
+                      args.opening_plies)
+    print("%s vs %s" % tuple(match["engines"]))
+    print("W/D/L: %d/%d/%d" % (match["wins"], match["draws"], match["losses"]))
+    print("Elo: %+.0f +/- %.0f" % (match["elo"], match["elo_margin"]))
+    for side in (0, 1):
+        times = [t for g in match["games"] for t in g["timings"][side]]
+        if times:
+            print("%s: %d moves, %.3fs mean, %.3fs max" % (match["engines"][side], len(times),
+                                                           sum(times) / len(times), max(times)))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(match, f, indent=2)
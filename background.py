@@ -0,0 +1,174 @@
+# Run the AI search on a worker thread so the pygame event loop keeps going.
+#
+# The search plays and undoes moves on its own copy of the position and
+# looks at the stop event every few thousand nodes, so cancel() returns
+# almost immediately. Ponder uses the same thread to search on the human's
+# time.
+
+import threading
+import time
+
+from bitboard import AI_PIECE, WIN_SCORE, from_array, mirror_move
+from search import CENTER_ORDER, MAX_DEPTH, iterative_deepening, terminal_value
+from transposition import TranspositionTable
+
+# Time each reply gets in the first round of pondering; it doubles every round
+PONDER_SLICE_MS = 100
+
+
+class BackgroundSearch:
+
+    # guess is the value of the previous search of the game, if any; it
+    # centers the first aspiration window
+    def __init__(self, position, time_ms, tt=None, piece=None, book=None, guess=None):
+        self.stop = threading.Event()
+        self._result = None
+        self._thread = threading.Thread(target=self._run, args=(position.copy(), time_ms, tt, piece, book, guess),
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self, position, time_ms, tt, piece, book, guess):
+        self._result = iterative_deepening(position, time_ms, piece=piece, tt=tt, stop=self.stop, book=book,
+                                           guess=guess)
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    # (column, value, depth) of the deepest finished iteration once done(),
+    # None if it was cancelled before depth 1 finished
+    def result(self):
+        return self._result
+
+    def cancel(self):
+        self.stop.set()
+        self._thread.join()
+
+
+# A search whose result is already known, for the places that expect a
+# BackgroundSearch
+class FinishedSearch:
+
+    def __init__(self, result):
+        self._result = result
+
+    def done(self):
+        return True
+
+    def result(self):
+        return self._result
+
+    def cancel(self):
+        pass
+
+
+# Search the positions after the human's replies while the human thinks.
+# position has the human to move and tt is the table the AI searches with,
+# which is where the work ends up. The predicted reply (the best move the
+# table holds for the position) goes first, the others center first. Every
+# round gives each reply slice_ms of iterative deepening and then doubles
+# the slice, until cancel() or take() or until every reply is won, lost or
+# solved. Replies in the book are left to the book.
+class Ponder:
+
+    def __init__(self, position, tt, piece, book=None, slice_ms=PONDER_SLICE_MS):
+        self.stop = threading.Event()
+        # Per position key: (column, value, depth) and seconds searched
+        self.results = {}
+        self.spent = {}
+        self._thread = threading.Thread(target=self._run, args=(position.copy(), tt, piece, book, slice_ms),
+                                        daemon=True)
+        self._thread.start()
+
+    def _replies(self, position, tt):
+        predicted = None
+        key, mirrored = position.canonical_key()
+        entry = tt.probe(key)
+        if entry is not None and entry[3] >= 0:
+            predicted = mirror_move(entry[3]) if mirrored else entry[3]
+        order = [predicted] if predicted is not None and position.can_play(predicted) else []
+        return order + [c for c in CENTER_ORDER if c not in order and position.can_play(c)]
+
+    def _run(self, position, tt, piece, book, slice_ms):
+        children = []
+        for col in self._replies(position, tt):
+            child = position.copy()
+            child.play(col)
+            if terminal_value(child, piece) is None and (book is None or book.probe(child) is None):
+                children.append(child)
+                self.spent[child.key] = 0.0
+        while children:
+            for child in list(children):
+                start = time.perf_counter()
+                result = iterative_deepening(child, slice_ms, piece=piece, tt=tt, stop=self.stop)
+                if self.stop.is_set():
+                    return
+                self.spent[child.key] += time.perf_counter() - start
+                self.results[child.key] = result
+                if abs(result[1]) == WIN_SCORE or result[2] >= MAX_DEPTH - sum(child.heights):
+                    children.remove(child)
+            slice_ms *= 2
+
+    def cancel(self):
+        self.stop.set()
+        self._thread.join()
+
+    # Stop pondering and return a FinishedSearch for position (the AI to
+    # move after the human's reply) if that reply was searched for at least
+    # time_ms, otherwise None
+    def take(self, position, time_ms):
+        self.cancel()
+        key = position.key
+        if key in self.results and self.spent[key] * 1000 >= time_ms:
+            return FinishedSearch(self.results[key])
+        return None
+
+
+# The AI side of a GUI game loop: think(board) on the AI's turn starts a
+# BackgroundSearch, or takes the answer from pondering when the human played
+# a reply that was searched long enough; poll() returns (column, value,
+# depth) once the move is ready; ponder(board) after the AI's move searches
+# the human's replies until the next think(). stop() ends all of it and
+# must be called whenever the game ends, or pondering would go on.
+class AIPlayer:
+
+    def __init__(self, time_ms, tt=None, book=None, piece=AI_PIECE, ponder=True):
+        self.time_ms = time_ms
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.book = book
+        self.piece = piece
+        self.pondering = ponder
+        self.search = None
+        self._ponder = None
+        # Value of the last AI move, the center of the next aspiration window
+        self.guess = None
+
+    def think(self, board):
+        if self.search is not None:
+            return
+        position = from_array(board, self.piece)
+        if self._ponder is not None:
+            self.search = self._ponder.take(position, self.time_ms)
+            self._ponder = None
+        if self.search is None:
+            self.search = BackgroundSearch(position, self.time_ms, tt=self.tt, book=self.book, guess=self.guess)
+
+    def poll(self):
+        if self.search is None or not self.search.done():
+            return None
+        result = self.search.result()
+        self.search = None
+        if result is not None:
+            self.guess = result[1]
+        return result
+
+    def ponder(self, board):
+        if self.pondering and self._ponder is None:
+            self._ponder = Ponder(from_array(board, 3 - self.piece), self.tt, self.piece, self.book)
+
+    def stop(self):
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+        if self._ponder is not None:
+            self._ponder.cancel()
+            self._ponder = None
@@ -0,0 +1,229 @@
+# Reproducible benchmark of the search and evaluation hot paths.
+#
+# A fixed corpus of opening, midgame and endgame positions is searched with
+# the random module reseeded before every engine.minimax call, so two runs of
+# the same code do exactly the same work. Results are written as JSON; give
+# the JSON of an earlier run as a second argument to see what got slower.
+#
+#     python benchmark.py results.json [baseline.json]
+
+import json
+import math
+import platform
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+import engine
+import vector_eval
+from bitboard import from_moves, has_four, score_position as bitboard_score
+from search import DRIVERS, Searcher
+from transposition import TranspositionTable
+
+SEED = 20240601
+
+# Move strings in the from_moves format, none of them finished games
+CORPUS = {
+    "opening": ["", "4", "4453", "44434"],
+    "midgame": ["44434333", "445332662117", "4443433344656226"],
+    "endgame": ["45532411351214464222456727", "12234213453135743461147362",
+                "53662572546534665311777631"],
+}
+
+# Deepest iteration of the bitboard search and of engine.minimax
+SEARCH_DEPTH = 8
+ENGINE_DEPTH = 4
+
+# Repeats of each per-call timing; the fastest one is reported
+REPEAT = 5
+
+
+def _corpus():
+    for phase, games in CORPUS.items():
+        for moves in games:
+            yield phase, moves
+
+
+def _board(position):
+    return np.array(position.to_array(), dtype=float)
+
+
+# Iterative deepening with one table, as the GUI runs it: cumulative time
+# and nodes when each depth finishes
+def bench_search(position, max_depth=SEARCH_DEPTH):
+    searcher = Searcher(position.turn, TranspositionTable())
+    depths = []
+    hint = None
+    start = time.perf_counter()
+    for depth in range(1, max_depth + 1):
+        hint, value = searcher.search_root(position, depth, -math.inf, math.inf, hint)
+        elapsed = time.perf_counter() - start
+        depths.append({"depth": depth, "seconds": elapsed, "nodes": searcher.nodes,
+                       "column": hint, "value": value})
+    return {
+        "depths": depths,
+        "nodes": searcher.nodes,
+        "seconds": elapsed,
+        "nodes_per_second": searcher.nodes / elapsed if elapsed else 0.0,
+    }
+
+
+# Nodes and time of every search driver at one depth, each with a fresh
+# table; they must agree on the column and value
+def bench_drivers(position, depth=SEARCH_DEPTH):
+    results = {}
+    for driver in DRIVERS:
+        searcher = Searcher(position.turn, TranspositionTable(), pvs=driver == "pvs")
+        start = time.perf_counter()
+        if driver == "mtdf":
+            column, value = searcher.mtdf(position, depth)
+        else:
+            column, value = searcher.search_root(position, depth, -math.inf, math.inf)
+        results[driver] = {"nodes": searcher.nodes, "seconds": time.perf_counter() - start,
+                           "column": column, "value": value}
+    first = results[DRIVERS[0]]
+    for driver in DRIVERS[1:]:
+        if (results[driver]["column"], results[driver]["value"]) != (first["column"], first["value"]):
+            raise AssertionError("%s disagrees with %s at depth %d" % (driver, DRIVERS[0], depth))
+    return results
+
+
+# engine.minimax at every depth from scratch, the AI maximising; board is a
+# numpy array (copied at every node) or an engine.Board (played in place)
+def bench_engine(board, max_depth=ENGINE_DEPTH):
+    depths = []
+    for depth in range(1, max_depth + 1):
+        random.seed(SEED)
+        start = time.perf_counter()
+        column, value = engine.minimax(board, depth, -math.inf, math.inf, True)
+        depths.append({"depth": depth, "seconds": time.perf_counter() - start,
+                       "column": column, "value": value})
+    return {"depths": depths}
+
+
+def _per_call(func, args, repeat=REPEAT):
+    best = min(timeit.repeat(lambda: [func(*a) for a in args], number=1, repeat=repeat))
+    return best / len(args)
+
+
+# Seconds per call of the evaluation and win checks over the corpus boards
+def bench_calls(positions):
+    boards = [_board(position) for position in positions]
+    last_drops = []
+    for position, board in zip(positions, boards):
+        if position.moves:
+            col = position.moves[-1]
+            last_drops.append((board, engine.ROW_COUNT - position.heights[col], col))
+    return {
+        "score_position (engine)": _per_call(engine.score_position, [(b, engine.AI_PIECE) for b in boards]),
+        "score_position (engine Board)": _per_call(engine.score_position,
+                                                   [(engine.Board(b), engine.AI_PIECE) for b in boards]),
+        "score_position (vector_eval)": _per_call(vector_eval.score_position,
+                                                  [(b, engine.AI_PIECE) for b in boards]),
+        "score_position (bitboard)": _per_call(bitboard_score, [(p, engine.AI_PIECE) for p in positions]),
+        "winning_move (engine)": _per_call(engine.winning_move, [(b, engine.AI_PIECE) for b in boards]),
+        "winning_move_at (engine)": _per_call(engine.winning_move_at, last_drops),
+        "has_four (bitboard)": _per_call(has_four, [(p.boards[1],) for p in positions]),
+    }
+
+
+# Peak traced allocation, in bytes, while func runs
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run():
+    random.seed(SEED)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": SEED,
+            "search_depth": SEARCH_DEPTH,
+            "engine_depth": ENGINE_DEPTH,
+        },
+        "positions": [],
+    }
+    positions = []
+    total_nodes = total_seconds = 0
+    for phase, moves in _corpus():
+        position = from_moves(moves)
+        positions.append(position.copy())
+        search = bench_search(position)
+        total_nodes += search["nodes"]
+        total_seconds += search["seconds"]
+        results["positions"].append({
+            "phase": phase,
+            "moves": moves,
+            "search": search,
+            "drivers": bench_drivers(position),
+            "engine": bench_engine(_board(position)),
+            "engine_board": bench_engine(engine.Board(_board(position))),
+        })
+    results["search_nodes_per_second"] = total_nodes / total_seconds if total_seconds else 0.0
+    results["calls"] = bench_calls(positions)
+
+    midgame = from_moves(CORPUS["midgame"][0])
+    results["peak_memory"] = {
+        "search": peak_memory(bench_search, midgame),
+        "engine": peak_memory(bench_engine, _board(midgame)),
+        "engine_board": peak_memory(bench_engine, engine.Board(_board(midgame))),
+    }
+    return results
+
+
+# Every number in a result, keyed by its path, for comparing two runs
+def _flatten(value, path=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, "%s/%s" % (path, key) if path else key)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            yield from _flatten(item, "%s/%d" % (path, i))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield path, value
+
+
+# (path, old, new, new / old) for every timing, node count and memory figure
+# present in both runs
+def compare(old, new):
+    old_values = dict(_flatten(old))
+    rows = []
+    for path, value in _flatten(new):
+        name = path.rsplit("/", 1)[-1]
+        if path.startswith("meta") or name in ("depth", "column", "value"):
+            continue
+        if path in old_values and old_values[path]:
+            rows.append((path, old_values[path], value, value / old_values[path]))
+    return rows
+
+
+if __name__ == "__main__":
+    output = sys.argv[1] if len(sys.argv) > 1 else "benchmark.json"
+    results = run()
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("search: %.0f nodes/s" % results["search_nodes_per_second"])
+    for driver in DRIVERS:
+        print("%-10s %9d nodes at depth %d" % (
+            driver, sum(p["drivers"][driver]["nodes"] for p in results["positions"]), SEARCH_DEPTH))
+    for name, seconds in results["calls"].items():
+        print("%-30s %8.2f us/call" % (name, seconds * 1e6))
+    print("peak memory: search %d KiB, engine %d KiB, engine on Board %d KiB"
+          % (results["peak_memory"]["search"] // 1024, results["peak_memory"]["engine"] // 1024,
+             results["peak_memory"]["engine_board"] // 1024))
+    if len(sys.argv) > 2:
+        with open(sys.argv[2]) as f:
+            baseline = json.load(f)
+        print("%-60s %12s %12s %7s" % ("", "baseline", "current", "ratio"))
+        for path, old, new, ratio in compare(baseline, results):
+            print("%-60s %12.6g %12.6g %6.2fx" % (path, old, new, ratio))
@@ -0,0 +1,243 @@
+# Bitboard representation of a Connect 4 position.
+#
+# Every column takes ROW_COUNT + 1 bits (bit 0 is the bottom cell, the extra
+# top bit is always empty) so four-in-a-row checks are a handful of shifts
+# and masks instead of a scan over the whole grid.
+
+import random
+
+ROW_COUNT = 6
+COLUMN_COUNT = 7
+HEIGHT = ROW_COUNT + 1
+
+PLAYER_PIECE = 1
+AI_PIECE = 2
+
+# Same terminal scores as minimax in engine.py
+WIN_SCORE = 10000000
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(x):
+        return bin(x).count("1")
+
+
+def cell_bit(row, col):
+    return 1 << (col * HEIGHT + row)
+
+
+# Zobrist keys, one per (piece, bit) plus one for the side to move. A fixed
+# seed keeps the keys identical between runs.
+_zobrist_rng = random.Random(20240601)
+ZOBRIST = [[_zobrist_rng.getrandbits(64) for _ in range(COLUMN_COUNT * HEIGHT)] for _ in range(2)]
+SIDE_KEY = _zobrist_rng.getrandbits(64)
+
+# ZOBRIST of the cell in the same row of the mirrored column, so the key of
+# a position's mirror image can be kept alongside its own
+MIRROR_ZOBRIST = [[keys[(COLUMN_COUNT - 1 - i // HEIGHT) * HEIGHT + i % HEIGHT] for i in range(len(keys))]
+                  for keys in ZOBRIST]
+COLUMN_BITS = (1 << HEIGHT) - 1
+
+
+def mirror_move(col):
+    return COLUMN_COUNT - 1 - col
+
+
+def mirror_board(bb):
+    mirrored = 0
+    for col in range(COLUMN_COUNT):
+        mirrored |= ((bb >> (col * HEIGHT)) & COLUMN_BITS) << (mirror_move(col) * HEIGHT)
+    return mirrored
+
+
+def _window_masks():
+    masks = []
+    # Horizontal
+    for r in range(ROW_COUNT):
+        for c in range(COLUMN_COUNT - 3):
+            masks.append(sum(cell_bit(r, c + i) for i in range(4)))
+    # Vertical
+    for c in range(COLUMN_COUNT):
+        for r in range(ROW_COUNT - 3):
+            masks.append(sum(cell_bit(r + i, c) for i in range(4)))
+    # Positive diagonal
+    for r in range(ROW_COUNT - 3):
+        for c in range(COLUMN_COUNT - 3):
+            masks.append(sum(cell_bit(r + i, c + i) for i in range(4)))
+    # Negative diagonal
+    for r in range(3, ROW_COUNT):
+        for c in range(COLUMN_COUNT - 3):
+            masks.append(sum(cell_bit(r - i, c + i) for i in range(4)))
+    return masks
+
+
+WINDOW_MASKS = _window_masks()
+CENTER_MASK = sum(cell_bit(r, COLUMN_COUNT // 2) for r in range(ROW_COUNT))
+
+
+# Scores of evaluate_window and the center bonus from the GUI scripts:
+# (four, open three, open two, opponent's open three, center cell)
+DEFAULT_WEIGHTS = (100, 5, 2, -4, 6)
+
+
+# evaluate_window keyed by (own count, opponent count)
+def _window_score(own, opp, weights=DEFAULT_WEIGHTS):
+    four, three, two, opp_three = weights[:4]
+    empty = 4 - own - opp
+    score = 0
+    if own == 4:
+        score += four
+    elif own == 3 and empty == 1:
+        score += three
+    elif own == 2 and empty == 2:
+        score += two
+    if opp == 3 and empty == 1:
+        score += opp_three
+    return score
+
+
+def _window_scores(weights):
+    return [[_window_score(own, opp, weights) for opp in range(5)] for own in range(5)]
+
+
+WINDOW_SCORES = _window_scores(DEFAULT_WEIGHTS)
+
+
+def has_four(bb):
+    for shift in (1, HEIGHT, HEIGHT - 1, HEIGHT + 1):
+        m = bb & (bb >> shift)
+        if m & (m >> (2 * shift)):
+            return True
+    return False
+
+
+class Position:
+    __slots__ = ("boards", "heights", "moves", "turn", "key", "mirror_key")
+
+    def __init__(self, turn=PLAYER_PIECE):
+        # boards[piece - 1] holds the cells owned by that piece
+        self.boards = [0, 0]
+        self.heights = [0] * COLUMN_COUNT
+        self.moves = []
+        self.turn = turn
+        # Zobrist hash, updated incrementally by play() and undo(), and the
+        # hash of the mirror image
+        self.key = SIDE_KEY if turn == AI_PIECE else 0
+        self.mirror_key = self.key
+
+    def copy(self):
+        other = Position(self.turn)
+        other.boards = self.boards[:]
+        other.heights = self.heights[:]
+        other.moves = self.moves[:]
+        other.key = self.key
+        other.mirror_key = self.mirror_key
+        return other
+
+    def can_play(self, col):
+        return self.heights[col] < ROW_COUNT
+
+    def valid_moves(self):
+        return [c for c in range(COLUMN_COUNT) if self.heights[c] < ROW_COUNT]
+
+    def is_full(self):
+        return all(h == ROW_COUNT for h in self.heights)
+
+    def play(self, col):
+        piece = self.turn
+        index = col * HEIGHT + self.heights[col]
+        self.boards[piece - 1] |= 1 << index
+        self.key ^= ZOBRIST[piece - 1][index] ^ SIDE_KEY
+        self.mirror_key ^= MIRROR_ZOBRIST[piece - 1][index] ^ SIDE_KEY
+        self.heights[col] += 1
+        self.moves.append(col)
+        self.turn = 3 - piece
+
+    def undo(self):
+        col = self.moves.pop()
+        self.heights[col] -= 1
+        self.turn = 3 - self.turn
+        index = col * HEIGHT + self.heights[col]
+        self.boards[self.turn - 1] ^= 1 << index
+        self.key ^= ZOBRIST[self.turn - 1][index] ^ SIDE_KEY
+        self.mirror_key ^= MIRROR_ZOBRIST[self.turn - 1][index] ^ SIDE_KEY
+
+    def is_win(self, piece):
+        return has_four(self.boards[piece - 1])
+
+    # The smaller of key and mirror_key, shared by the position and its
+    # mirror image, and whether it is the mirror's. Moves stored under it
+    # go through mirror_move when it is.
+    def canonical_key(self):
+        if self.mirror_key < self.key:
+            return self.mirror_key, True
+        return self.key, False
+
+    # Cell values as a list of rows, top row first like the numpy boards
+    def to_array(self):
+        rows = []
+        for r in range(ROW_COUNT - 1, -1, -1):
+            row = []
+            for c in range(COLUMN_COUNT):
+                bit = cell_bit(r, c)
+                if self.boards[0] & bit:
+                    row.append(PLAYER_PIECE)
+                elif self.boards[1] & bit:
+                    row.append(AI_PIECE)
+                else:
+                    row.append(0)
+            rows.append(row)
+        return rows
+
+
+# Build a position from a numpy board of engine.py (row 0 is the top)
+def from_array(board, turn):
+    position = Position(turn)
+    for c in range(COLUMN_COUNT):
+        for r in range(ROW_COUNT):
+            piece = int(board[ROW_COUNT - 1 - r][c])
+            if piece == 0:
+                break
+            position.boards[piece - 1] |= cell_bit(r, c)
+            position.key ^= ZOBRIST[piece - 1][c * HEIGHT + r]
+            position.mirror_key ^= MIRROR_ZOBRIST[piece - 1][c * HEIGHT + r]
+            position.heights[c] += 1
+    return position
+
+
+# Build a position from a move string such as "4453" (1-based columns, player 1 first)
+def from_moves(moves, turn=PLAYER_PIECE):
+    position = Position(turn)
+    for ch in moves:
+        col = int(ch) - 1
+        if not 0 <= col < COLUMN_COUNT or not position.can_play(col):
+            raise ValueError("invalid move sequence: %r" % moves)
+        position.play(col)
+    return position
+
+
+# score_position from the GUI scripts, counted with window masks
+def score_position(position, piece):
+    own = position.boards[piece - 1]
+    opp = position.boards[2 - piece]
+    score = popcount(own & CENTER_MASK) * 6
+    for mask in WINDOW_MASKS:
+        score += WINDOW_SCORES[popcount(own & mask)][popcount(opp & mask)]
+    return score
+
+
+# score_position with other weights, in the order of DEFAULT_WEIGHTS
+def make_evaluator(weights):
+    table = _window_scores(weights)
+    center = weights[4]
+
+    def evaluate(position, piece):
+        own = position.boards[piece - 1]
+        opp = position.boards[2 - piece]
+        score = popcount(own & CENTER_MASK) * center
+        for mask in WINDOW_MASKS:
+            score += table[popcount(own & mask)][popcount(opp & mask)]
+        return score
+
+    return evaluate
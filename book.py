@@ -0,0 +1,173 @@
+# Opening book: best move and score for every position of the first few
+# plies, worked out offline by a deep search.
+#
+# The file is a small header followed by fixed-size (key, move, score)
+# records sorted by key; a position and its mirror image share a record.
+# OpeningBook maps the file with mmap and finds a position by binary search,
+# so opening it reads nothing but the header and a lookup touches O(log n)
+# records.
+#
+#     python book.py [path] [plies] [depth]
+
+import mmap
+import os
+import struct
+import sys
+import time
+import warnings
+
+from bitboard import AI_PIECE, SIDE_KEY, ZOBRIST, from_moves, mirror_board, mirror_move, popcount
+from search import minimax, terminal_value
+from transposition import TranspositionTable
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+# Positions up to BOOK_PLIES moves in, each searched SEARCH_DEPTH plies deep
+BOOK_PLIES = 4
+SEARCH_DEPTH = 10
+
+MAGIC = b"C4BK"
+VERSION = 2
+# magic, version, search depth, record count
+HEADER = struct.Struct("<4sHHI")
+# position key, best column, score for the side to move
+RECORD = struct.Struct("<Qbi")
+KEY = struct.Struct("<Q")
+
+
+def _key(first, second, turn):
+    key = SIDE_KEY if turn == AI_PIECE else 0
+    for piece, board in enumerate((first, second)):
+        while board:
+            bit = board & -board
+            key ^= ZOBRIST[piece][bit.bit_length() - 1]
+            board ^= bit
+    return key
+
+
+# Key of the position with the side that moved first as piece 1, so games the
+# AI opens share the entries of games the player opens, made canonical as in
+# Position.canonical_key: (key, whether it is the mirror image's)
+def book_key(position):
+    first, second = position.boards
+    own = popcount(first)
+    other = popcount(second)
+    if other > own or (other == own and position.turn == AI_PIECE):
+        turn = 3 - position.turn
+        key = _key(second, first, turn)
+        mirror_key = _key(mirror_board(second), mirror_board(first), turn)
+        if mirror_key < key:
+            return mirror_key, True
+        return key, False
+    return position.canonical_key()
+
+
+class OpeningBook:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            self._file.close()
+            raise ValueError("%s is not an opening book" % path)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.depth, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or size < HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise ValueError("%s is not an opening book of version %d" % (path, VERSION))
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # (column, score) with the score from the side to move's point of
+    # view, or None when the position is not in the book
+    def probe(self, position):
+        key, mirrored = book_key(position)
+        low = 0
+        high = self.count
+        while low < high:
+            mid = (low + high) // 2
+            found = KEY.unpack_from(self._map, HEADER.size + mid * RECORD.size)[0]
+            if found < key:
+                low = mid + 1
+            elif found > key:
+                high = mid
+            else:
+                _, move, score = RECORD.unpack_from(self._map, HEADER.size + mid * RECORD.size)
+                return (mirror_move(move) if mirrored else move), score
+        return None
+
+
+# The book at path, or None if it has not been built or was written by
+# another version of this file
+def open_book(path=DEFAULT_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        return OpeningBook(path)
+    except ValueError as e:
+        warnings.warn("%s; rebuild it with python book.py" % e)
+        return None
+
+
+# Every position that can arise in the first plies moves and is not over
+# yet, one of each mirrored pair
+def book_positions(plies):
+    positions = {}
+    frontier = [from_moves("")]
+    for _ in range(plies + 1):
+        following = []
+        for position in frontier:
+            key = position.canonical_key()[0]
+            if key in positions or terminal_value(position, position.turn) is not None:
+                continue
+            positions[key] = position
+            for col in position.valid_moves():
+                child = position.copy()
+                child.play(col)
+                following.append(child)
+        frontier = following
+    return list(positions.values())
+
+
+def build(path=DEFAULT_PATH, plies=BOOK_PLIES, depth=SEARCH_DEPTH, progress=None):
+    positions = book_positions(plies)
+    # One table per side to move, see search.Searcher
+    tables = {1: TranspositionTable(), 2: TranspositionTable()}
+    records = []
+    for i, position in enumerate(positions):
+        column, score = minimax(position, depth, tt=tables[position.turn])
+        key, mirrored = position.canonical_key()
+        records.append((key, mirror_move(column) if mirrored else column, score))
+        if progress is not None:
+            progress(i + 1, len(positions))
+    records.sort()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, depth, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    return len(records)
+
+
+if __name__ == "__main__":
+    out = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    book_plies = int(sys.argv[2]) if len(sys.argv) > 2 else BOOK_PLIES
+    search_depth = int(sys.argv[3]) if len(sys.argv) > 3 else SEARCH_DEPTH
+    started = time.perf_counter()
+
+    def report(done, total):
+        if done % 50 == 0 or done == total:
+            print("%d/%d positions, %.0fs" % (done, total, time.perf_counter() - started))
+
+    count = build(out, book_plies, search_depth, report)
+    print("wrote %d positions to %s (%d bytes)" % (count, out, HEADER.size + count * RECORD.size))
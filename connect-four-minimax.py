@@ -1,10 +1,15 @@
-import numpy as np
 import pygame
 import sys
 import math
 import random
 from threading import Timer
 
+from background import AIPlayer
+from book import open_book
+from engine import (COLUMN_COUNT, ROW_COUNT, create_board, drop_piece, get_next_open_row, is_valid_location,
+                    winning_move_at)
+from transposition import TranspositionTable
+
 
 # Colors
 BLUE = (0, 0, 255)
@@ -12,9 +17,14 @@ BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 YELLOW = (255, 255, 0)
 
-# Board dimensions
-ROW_COUNT = 6
-COLUMN_COUNT = 7
+# Thinking time per AI move
+AI_TIME_MS = 1000
+
+# Search the human's likely replies while waiting for their move
+PONDER = True
+
+# Frame rate of the event loop, also while the AI is thinking
+FPS = 60
 
 # Initialize pygame
 pygame.init()
@@ -32,10 +42,6 @@ screen = pygame.display.set_mode(size)
 # Font
 font = pygame.font.SysFont("monospace", 75)
 
-# Function to create board
-def create_board():
-    return np.zeros((ROW_COUNT, COLUMN_COUNT))
-
 # Function to draw the board
 def draw_board(board):
     for c in range(COLUMN_COUNT):
@@ -51,181 +57,6 @@ def draw_board(board):
     pygame.display.update()
 
 
-def create_board():
-    board = np.zeros((ROW_COUNT, COLUMN_COUNT))
-    return board
-
-
-def drop_piece(board, row, col, piece):
-    board[row][col] = piece
-
-
-def is_valid_location(board, col):
-    return board[0][col] == 0
-
-
-def get_next_open_row(board, col):
-    for r in range(ROW_COUNT - 1, -1, -1):
-        if board[r][col] == 0:
-            return r
-
-
-# Function to check winning move
-def winning_move(board, piece):
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT):
-            if board[r][c] == piece and board[r][c + 1] == piece and board[r][c + 2] == piece and board[r][
-                c + 3] == piece:
-                return True
-
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT - 3):
-            if board[r][c] == piece and board[r + 1][c] == piece and board[r + 2][c] == piece and board[r + 3][
-                c] == piece:
-                return True
-
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(3, ROW_COUNT):
-            if board[r][c] == piece and board[r - 1][c + 1] == piece and board[r - 2][c + 2] == piece and board[r - 3][
-                c + 3] == piece:
-                return True
-
-    for c in range(3, COLUMN_COUNT):
-        for r in range(3, ROW_COUNT):
-            if board[r][c] == piece and board[r - 1][c - 1] == piece and board[r - 2][c - 2] == piece and board[r - 3][
-                c - 3] == piece:
-                return True
-
-# Function to evaluate board for AI
-def evaluate_window(window, piece):
-    PLAYER_TURN = 0
-    AI_TURN = 1
-
-    PLAYER_PIECE = 1
-    AI_PIECE = 2
-    opponent_piece = PLAYER_PIECE
-
-    if piece == PLAYER_PIECE:
-        opponent_piece = AI_PIECE
-    score = 0
-    if window.count(piece) == 4:
-        score += 100
-    elif window.count(piece) == 3 and window.count(0) == 1:
-        score += 5
-    elif window.count(piece) == 2 and window.count(0) == 2:
-        score += 2
-
-    if window.count(opponent_piece) == 3 and window.count(0) == 1:
-        score -= 4
-
-    return score
-
-# Function to calculate AI score
-def score_position(board, piece):
-    score = 0
-
-    center_array = [int(i) for i in list(board[:, COLUMN_COUNT // 2])]
-    center_count = center_array.count(piece)
-    score += center_count * 6
-
-    for r in range(ROW_COUNT):
-        row_array = [int(i) for i in list(board[r, :])]
-        for c in range(COLUMN_COUNT - 3):
-            window = row_array[c:c + 4]
-            score += evaluate_window(window, piece)
-
-    for c in range(COLUMN_COUNT):
-        col_array = [int(i) for i in list(board[:, c])]
-        for r in range(ROW_COUNT - 3):
-            window = col_array[r:r + 4]
-            score += evaluate_window(window, piece)
-
-    for r in range(3, ROW_COUNT):
-        for c in range(COLUMN_COUNT - 3):
-            window = [board[r - i][c + i] for i in range(4)]
-            score += evaluate_window(window, piece)
-
-    for r in range(3, ROW_COUNT):
-        for c in range(3, COLUMN_COUNT):
-            window = [board[r - i][c - i] for i in range(4)]
-            score += evaluate_window(window, piece)
-
-    return score
-
-def is_terminal_node(board):
-    PLAYER_TURN = 0
-    AI_TURN = 1
-
-    PLAYER_PIECE = 1
-    AI_PIECE = 2
-    return winning_move(board, PLAYER_PIECE) or winning_move(board, AI_PIECE) or len(get_valid_locations(board)) == 0
-
-# Function for AI move
-def minimax(board, depth, alpha, beta, maximizing_player):
-    PLAYER_TURN = 0
-    AI_TURN = 1
-
-    PLAYER_PIECE = 1
-    AI_PIECE = 2
-    valid_locations = get_valid_locations(board)
-
-    is_terminal = is_terminal_node(board)
-
-    if depth == 0 or is_terminal:
-        if is_terminal:
-            if winning_move(board, AI_PIECE):
-                return (None, 10000000)
-            elif winning_move(board, PLAYER_PIECE):
-                return (None, -10000000)
-            else:
-                return (None, 0)
-        else:
-            return (None, score_position(board, AI_PIECE))
-
-    if maximizing_player:
-        value = -math.inf
-        column = random.choice(valid_locations)
-
-        for col in valid_locations:
-            row = get_next_open_row(board, col)
-            b_copy = board.copy()
-            drop_piece(b_copy, row, col, AI_PIECE)
-            new_score = minimax(b_copy, depth - 1, alpha, beta, False)[1]
-            if new_score > value:
-                value = new_score
-                column = col
-            alpha = max(value, alpha)
-            if alpha >= beta:
-                break
-
-        return column, value
-
-    else:
-        value = math.inf
-        column = random.choice(valid_locations)
-        for col in valid_locations:
-            row = get_next_open_row(board, col)
-            b_copy = board.copy()
-            drop_piece(b_copy, row, col, PLAYER_PIECE)
-            new_score = minimax(b_copy, depth - 1, alpha, beta, True)[1]
-            if new_score < value:
-                value = new_score
-                column = col
-            beta = min(value, beta)
-            if alpha >= beta:
-                break
-        return column, value
-
-def get_valid_locations(board):
-    valid_locations = []
-
-    for column in range(COLUMN_COUNT):
-        if is_valid_location(board, column):
-            valid_locations.append(column)
-
-    return valid_locations
-
-
 def end_game():
     global game_over
     game_over = True
@@ -240,6 +71,7 @@ def ai_game():
     PLAYER_PIECE = 1
     AI_PIECE = 2
     board = create_board()
+    ai = AIPlayer(AI_TIME_MS, tt=TranspositionTable(), book=open_book(), piece=AI_PIECE, ponder=PONDER)
 
     game_over = False
     not_over = True
@@ -259,11 +91,14 @@ def ai_game():
     draw_board(board)
     pygame.display.update()
 
+    clock = pygame.time.Clock()
+
     while not game_over:
 
         for event in pygame.event.get():
 
             if event.type == pygame.QUIT:
+                ai.stop()
                 sys.exit()
 
             if event.type == pygame.MOUSEMOTION and not_over:
@@ -283,11 +118,12 @@ def ai_game():
                     if is_valid_location(board, col):
                         row = get_next_open_row(board, col)
                         drop_piece(board, row, col, PLAYER_PIECE)
-                        if winning_move(board, PLAYER_PIECE):
+                        if winning_move_at(board, row, col):
                             print("PLAYER 1 WINS!")
                             label = my_font.render("PLAYER 1 WINS!", 1, RED)
                             screen.blit(label, (40, 10))
                             not_over = False
+                            ai.stop()
                             t = Timer(3.0, end_game)
                             t.start()
 
@@ -299,25 +135,33 @@ def ai_game():
             pygame.display.update()
 
         if turn == AI_TURN and not game_over and not_over:
+            ai.think(board)
+
+        result = ai.poll()
+        if result is not None:
 
-            col, minimax_score = minimax(board, 5, -math.inf, math.inf, True)
+            col, minimax_score, depth = result
 
             if is_valid_location(board, col):
-                pygame.time.wait(500)
                 row = get_next_open_row(board, col)
                 drop_piece(board, row, col, AI_PIECE)
-                if winning_move(board, AI_PIECE):
+                if winning_move_at(board, row, col):
                     print("PLAYER 2 WINS!")
                     label = my_font.render("PLAYER 2 WINS!", 1, YELLOW)
                     screen.blit(label, (40, 10))
                     not_over = False
+                    ai.stop()
                     t = Timer(3.0, end_game)
                     t.start()
             draw_board(board)
+            if not_over:
+                ai.ponder(board)
 
             turn += 1
             turn = turn % 2
 
+        clock.tick(FPS)
+
 # Main menu
 def main_menu():
     screen.fill(BLACK)
@@ -392,7 +236,7 @@ def two_player_game():
                         row = get_next_open_row(board, col)
                         drop_piece(board, row, col, 1)
 
-                        if winning_move(board, 1):
+                        if winning_move_at(board, row, col):
                             label = myfont.render("Player 1 wins!!", 1, RED)
                             screen.blit(label, (40, 10))
                             game_over = True
@@ -407,7 +251,7 @@ def two_player_game():
                         row = get_next_open_row(board, col)
                         drop_piece(board, row, col, 2)
 
-                        if winning_move(board, 2):
+                        if winning_move_at(board, row, col):
                             label = myfont.render("Player 2 wins!!", 1, YELLOW)
                             screen.blit(label, (40, 10))
                             game_over = True
@@ -0,0 +1,365 @@
+# Board logic and minimax for the numpy boards used by the GUI scripts.
+#
+# Nothing here imports pygame, and numpy is only imported when a board is
+# created, so batch jobs can import this module cheaply. Boards are arrays
+# with row 0 on top; 0 is empty, 1 the player and 2 the AI. Every function
+# takes either a plain numpy array or a Board. Boards default to 6x7 with
+# four in a row to win, but any size and line length works: numpy boards
+# take their size from their shape and the line length from connect, a
+# Board carries its own Geometry. The faster bitboard engine (standard
+# board only) lives in bitboard.py and search.py.
+
+import functools
+import math
+import random
+
+from bitboard import popcount
+
+ROW_COUNT = 6
+COLUMN_COUNT = 7
+CONNECT = 4
+
+PLAYER_PIECE = 1
+AI_PIECE = 2
+
+WIN_SCORE = 10000000
+
+
+# Everything that depends on the board size and the line length, worked
+# out once per geometry (see get_geometry()). Cells are numbered
+# r * columns + c and a set of cells is an int with those bits set. The
+# windows are every run of connect cells in a row, column or diagonal;
+# window_masks are the same as bit masks, cell_windows the windows through
+# each cell and window_scores evaluate_window by the number of pieces of
+# the side scored and of its opponent in the window.
+class Geometry:
+
+    def __init__(self, rows, columns, connect):
+        if connect < 2 or connect > max(rows, columns):
+            raise ValueError("cannot connect %d on a %dx%d board" % (connect, rows, columns))
+        self.rows = rows
+        self.columns = columns
+        self.connect = connect
+        self.center = columns // 2
+        self.center_mask = sum(1 << (r * columns + self.center) for r in range(rows))
+        windows = []
+        for r in range(rows):
+            for c in range(columns - connect + 1):
+                windows.append([r * columns + c + i for i in range(connect)])
+        for c in range(columns):
+            for r in range(rows - connect + 1):
+                windows.append([(r + i) * columns + c for i in range(connect)])
+        for r in range(connect - 1, rows):
+            for c in range(columns - connect + 1):
+                windows.append([(r - i) * columns + c + i for i in range(connect)])
+        for r in range(connect - 1, rows):
+            for c in range(connect - 1, columns):
+                windows.append([(r - i) * columns + c - i for i in range(connect)])
+        self.windows = windows
+        self.window_masks = [sum(1 << i for i in window) for window in windows]
+        self.cell_windows = [[w for w, window in enumerate(windows) if cell in window]
+                             for cell in range(rows * columns)]
+        self.cell_masks = [[self.window_masks[w] for w in ws] for ws in self.cell_windows]
+        self.window_scores = [[evaluate_window([PLAYER_PIECE] * own + [AI_PIECE] * other
+                                               + [0] * (connect - own - other), PLAYER_PIECE)
+                               if own + other <= connect else 0 for other in range(connect + 1)]
+                              for own in range(connect + 1)]
+
+
+@functools.lru_cache(maxsize=None)
+def get_geometry(rows=ROW_COUNT, columns=COLUMN_COUNT, connect=CONNECT):
+    return Geometry(rows, columns, connect)
+
+
+# Geometry of a Board, or of a numpy board of that shape with lines of connect
+def _geometry(board, connect):
+    if isinstance(board, Board):
+        return board.geometry
+    return get_geometry(len(board), len(board[0]), connect)
+
+
+# Cells of piece on the board as bits, see Geometry
+def _bits(board, piece):
+    if isinstance(board, Board):
+        return board.bits[piece - 1]
+    import numpy as np
+    return int.from_bytes(np.packbits(np.asarray(board) == piece, axis=None, bitorder="little").tobytes(),
+                          "little")
+
+
+# A board with int8 cells (42 bytes instead of 336 on the standard board),
+# the number of pieces in each column and a stack of the columns played.
+# Indexing reads the cells, so board[r][c] and board[:, c] work as on a
+# numpy board, but pieces go in through play (or drop_piece) to keep the
+# rest right. minimax plays and undoes moves on it instead of copying the
+# board. It also keeps the cells of each side as bits, how many pieces of
+# each side every window holds and score_position for both sides, updated
+# by play and undo through the windows of the one cell that changed, so
+# scoring a Board costs nothing and win checks are a few mask tests.
+class Board:
+    __slots__ = ("cells", "geometry", "heights", "moves", "bits", "counts", "scores")
+
+    # geometry defaults to the shape of cells with four in a row, or to the
+    # standard board
+    def __init__(self, cells=None, geometry=None):
+        import numpy as np
+        if cells is not None:
+            cells = np.array(cells, dtype=np.int8)
+            if geometry is None:
+                geometry = get_geometry(cells.shape[0], cells.shape[1])
+        elif geometry is None:
+            geometry = get_geometry()
+        if cells is None:
+            cells = np.zeros((geometry.rows, geometry.columns), dtype=np.int8)
+        self.cells = cells
+        self.geometry = geometry
+        self.heights = [int(np.count_nonzero(cells[:, c])) for c in range(geometry.columns)]
+        self.moves = []
+        self.bits = [0, 0]
+        self.counts = [[0] * len(geometry.windows), [0] * len(geometry.windows)]
+        # score_position(self, piece) is scores[piece]
+        self.scores = [0, 0, 0]
+        for r, c in zip(*np.nonzero(cells)):
+            self._count(int(r), int(c), int(cells[r, c]), 1)
+
+    def __getitem__(self, index):
+        return self.cells[index]
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.cells
+        return self.cells.astype(dtype)
+
+    def __repr__(self):
+        return "Board(%r)" % self.cells.tolist()
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.cells = self.cells.copy()
+        board.geometry = self.geometry
+        board.heights = list(self.heights)
+        board.moves = list(self.moves)
+        board.bits = list(self.bits)
+        board.counts = [list(self.counts[0]), list(self.counts[1])]
+        board.scores = list(self.scores)
+        return board
+
+    # Add (step 1) or remove (step -1) piece at (row, col) in the bits, the
+    # window counts and both scores
+    def _count(self, row, col, piece, step):
+        g = self.geometry
+        cell = row * g.columns + col
+        self.bits[piece - 1] ^= 1 << cell
+        own = self.counts[piece - 1]
+        other = self.counts[2 - piece]
+        scores = self.scores
+        table = g.window_scores
+        for w in g.cell_windows[cell]:
+            before = own[w]
+            after = before + step
+            m = other[w]
+            scores[piece] += table[after][m] - table[before][m]
+            scores[3 - piece] += table[m][after] - table[m][before]
+            own[w] = after
+        if col == g.center:
+            scores[piece] += 6 * step
+
+    # Drop piece into col and return the row it landed in
+    def play(self, col, piece):
+        row = self.geometry.rows - 1 - self.heights[col]
+        self.cells[row, col] = piece
+        self.heights[col] += 1
+        self.moves.append(col)
+        self._count(row, col, piece, 1)
+        return row
+
+    # Take back the last piece played and return its (row, col)
+    def undo(self):
+        col = self.moves.pop()
+        self.heights[col] -= 1
+        row = self.geometry.rows - 1 - self.heights[col]
+        self._count(row, col, int(self.cells[row, col]), -1)
+        self.cells[row, col] = 0
+        return row, col
+
+
+def create_board(rows=ROW_COUNT, columns=COLUMN_COUNT, connect=CONNECT):
+    return Board(geometry=get_geometry(rows, columns, connect))
+
+
+def drop_piece(board, row, col, piece):
+    if isinstance(board, Board):
+        # row is always the next open one
+        board.play(col, piece)
+    else:
+        board[row][col] = piece
+
+
+def is_valid_location(board, col):
+    if isinstance(board, Board):
+        return board.heights[col] < board.geometry.rows
+    return board[0][col] == 0
+
+
+def get_next_open_row(board, col):
+    if isinstance(board, Board):
+        if board.heights[col] < board.geometry.rows:
+            return board.geometry.rows - 1 - board.heights[col]
+        return None
+    for r in range(len(board) - 1, -1, -1):
+        if board[r][col] == 0:
+            return r
+
+
+def get_valid_locations(board):
+    valid_locations = []
+
+    for column in range(len(board[0])):
+        if is_valid_location(board, column):
+            valid_locations.append(column)
+
+    return valid_locations
+
+
+# connect is the line length of a numpy board; a Board knows its own
+def winning_move(board, piece, connect=CONNECT):
+    bits = _bits(board, piece)
+    for mask in _geometry(board, connect).window_masks:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+# Check only the lines through the piece just dropped at (row, col); a
+# numpy board is read only at the cells of the windows through it
+def winning_move_at(board, row, col, connect=CONNECT):
+    g = _geometry(board, connect)
+    piece = int(board[row][col])
+    if not piece:
+        return False
+    cell = row * g.columns + col
+    if isinstance(board, Board):
+        bits = board.bits[piece - 1]
+        for mask in g.cell_masks[cell]:
+            if bits & mask == mask:
+                return True
+        return False
+    flat = board.flat
+    for w in g.cell_windows[cell]:
+        for i in g.windows[w]:
+            if flat[i] != piece:
+                break
+        else:
+            return True
+    return False
+
+
+def evaluate_window(window, piece):
+    opponent_piece = PLAYER_PIECE
+
+    if piece == PLAYER_PIECE:
+        opponent_piece = AI_PIECE
+    score = 0
+    length = len(window)
+    if window.count(piece) == length:
+        score += 100
+    elif window.count(piece) == length - 1 and window.count(0) == 1:
+        score += 5
+    elif window.count(piece) == length - 2 and window.count(0) == 2:
+        score += 2
+
+    if window.count(opponent_piece) == length - 1 and window.count(0) == 1:
+        score -= 4
+
+    return score
+
+
+def score_position(board, piece, connect=CONNECT):
+    if isinstance(board, Board):
+        return board.scores[piece]
+    g = _geometry(board, connect)
+    own = _bits(board, piece)
+    other = _bits(board, AI_PIECE if piece == PLAYER_PIECE else PLAYER_PIECE)
+    score = popcount(own & g.center_mask) * 6
+    table = g.window_scores
+    for mask in g.window_masks:
+        score += table[popcount(own & mask)][popcount(other & mask)]
+    return score
+
+
+def is_terminal_node(board, connect=CONNECT):
+    return (winning_move(board, PLAYER_PIECE, connect) or winning_move(board, AI_PIECE, connect)
+            or len(get_valid_locations(board)) == 0)
+
+
+def minimax(board, depth, alpha, beta, maximizing_player, last_move=None, connect=CONNECT):
+    valid_locations = get_valid_locations(board)
+
+    if last_move is None:
+        ai_wins = winning_move(board, AI_PIECE, connect)
+        player_wins = winning_move(board, PLAYER_PIECE, connect)
+    else:
+        # Only the piece just dropped can have completed a line
+        row, col = last_move
+        won = winning_move_at(board, row, col, connect)
+        ai_wins = won and board[row][col] == AI_PIECE
+        player_wins = won and not ai_wins
+
+    is_terminal = ai_wins or player_wins or len(valid_locations) == 0
+    # A Board is searched in place, a numpy board by copying
+    compact = isinstance(board, Board)
+
+    if depth == 0 or is_terminal:
+        if is_terminal:
+            if ai_wins:
+                return (None, WIN_SCORE)
+            elif player_wins:
+                return (None, -WIN_SCORE)
+            else:
+                return (None, 0)
+        else:
+            return (None, score_position(board, AI_PIECE, connect))
+
+    if maximizing_player:
+        value = -math.inf
+        column = random.choice(valid_locations)
+
+        for col in valid_locations:
+            if compact:
+                row = board.play(col, AI_PIECE)
+                new_score = minimax(board, depth - 1, alpha, beta, False, (row, col), connect)[1]
+                board.undo()
+            else:
+                row = get_next_open_row(board, col)
+                b_copy = board.copy()
+                drop_piece(b_copy, row, col, AI_PIECE)
+                new_score = minimax(b_copy, depth - 1, alpha, beta, False, (row, col), connect)[1]
+            if new_score > value:
+                value = new_score
+                column = col
+            alpha = max(value, alpha)
+            if alpha >= beta:
+                break
+
+        return column, value
+
+    else:
+        value = math.inf
+        column = random.choice(valid_locations)
+        for col in valid_locations:
+            if compact:
+                row = board.play(col, PLAYER_PIECE)
+                new_score = minimax(board, depth - 1, alpha, beta, True, (row, col), connect)[1]
+                board.undo()
+            else:
+                row = get_next_open_row(board, col)
+                b_copy = board.copy()
+                drop_piece(b_copy, row, col, PLAYER_PIECE)
+                new_score = minimax(b_copy, depth - 1, alpha, beta, True, (row, col), connect)[1]
+            if new_score < value:
+                value = new_score
+                column = col
+            beta = min(value, beta)
+            if alpha >= beta:
+                break
+        return column, value
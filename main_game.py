@@ -1,19 +1,29 @@
-import numpy as np
 import pygame
 import sys
 import math
 import random
 from threading import Timer
 
+from background import AIPlayer
+from book import open_book
+from engine import (AI_PIECE, COLUMN_COUNT, PLAYER_PIECE, ROW_COUNT, create_board, drop_piece,
+                    get_next_open_row, is_valid_location, winning_move_at)
+from transposition import TranspositionTable
+
 # Colors
 BLUE = (0, 0, 255)
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 YELLOW = (255, 255, 0)
 
-# Board dimensions
-ROW_COUNT = 6
-COLUMN_COUNT = 7
+# Thinking time per AI move
+AI_TIME_MS = 1000
+
+# Search the human's likely replies while waiting for their move
+PONDER = True
+
+# Frame rate of the event loop, also while the AI is thinking
+FPS = 60
 
 # Initialize pygame
 pygame.init()
@@ -31,10 +41,6 @@ screen = pygame.display.set_mode(size)
 # Font
 font = pygame.font.SysFont("monospace", 75)
 
-# Function to create board
-def create_board():
-    return np.zeros((ROW_COUNT, COLUMN_COUNT))
-
 # Function to draw the board
 def draw_board(board):
     for c in range(COLUMN_COUNT):
@@ -49,133 +55,21 @@ def draw_board(board):
                 pygame.draw.circle(screen, YELLOW, (int(c * SQUARESIZE + SQUARESIZE / 2), height - int(r * SQUARESIZE + SQUARESIZE / 2)), RADIUS)
     pygame.display.update()
 
-# Function to check winning move
-def winning_move(board, piece):
-    # Horizontal
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT):
-            if board[r][c] == piece and board[r][c+1] == piece and board[r][c+2] == piece and board[r][c+3] == piece:
-                return True
-    # Vertical
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT - 3):
-            if board[r][c] == piece and board[r+1][c] == piece and board[r+2][c] == piece and board[r+3][c] == piece:
-                return True
-    # Positive Diagonal
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT - 3):
-            if board[r][c] == piece and board[r+1][c+1] == piece and board[r+2][c+2] == piece and board[r+3][c+3] == piece:
-                return True
-    # Negative Diagonal
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(3, ROW_COUNT):
-            if board[r][c] == piece and board[r-1][c+1] == piece and board[r-2][c+2] == piece and board[r-3][c+3] == piece:
-                return True
-
-# Function to evaluate board for AI
-def evaluate_window(window, piece):
-    opponent_piece = 1 if piece == 2 else 2
-    score = 0
-    if window.count(piece) == 4:
-        score += 100
-    elif window.count(piece) == 3 and window.count(0) == 1:
-        score += 5
-    elif window.count(piece) == 2 and window.count(0) == 2:
-        score += 2
-    if window.count(opponent_piece) == 3 and window.count(0) == 1:
-        score -= 4
-    return score
-
-# Function to calculate AI score
-def score_position(board, piece):
-    score = 0
-    center_array = [int(i) for i in list(board[:, COLUMN_COUNT // 2])]
-    center_count = center_array.count(piece)
-    score += center_count * 6
-
-    for r in range(ROW_COUNT):
-        row_array = [int(i) for i in list(board[r, :])]
-        for c in range(COLUMN_COUNT - 3):
-            window = row_array[c:c+4]
-            score += evaluate_window(window, piece)
-
-    for c in range(COLUMN_COUNT):
-        col_array = [int(i) for i in list(board[:, c])]
-        for r in range(ROW_COUNT - 3):
-            window = col_array[r:r+4]
-            score += evaluate_window(window, piece)
-
-    for r in range(ROW_COUNT - 3):
-        for c in range(COLUMN_COUNT - 3):
-            window = [board[r+i][c+i] for i in range(4)]
-            score += evaluate_window(window, piece)
-
-    for r in range(ROW_COUNT - 3):
-        for c in range(COLUMN_COUNT - 3):
-            window = [board[r+3-i][c+i] for i in range(4)]
-            score += evaluate_window(window, piece)
-
-    return score
-
-# Function for AI move
-def minimax(board, depth, alpha, beta, maximizing_player):
-    valid_locations = [c for c in range(COLUMN_COUNT) if board[ROW_COUNT-1][c] == 0]
-    is_terminal = winning_move(board, 1) or winning_move(board, 2) or len(valid_locations) == 0
-
-    if depth == 0 or is_terminal:
-        if is_terminal:
-            if winning_move(board, 2):
-                return (None, 100000000000000)
-            elif winning_move(board, 1):
-                return (None, -10000000000000)
-            else:
-                return (None, 0)
-        else:
-            return (None, score_position(board, 2))
-
-    if maximizing_player:
-        value = -math.inf
-        column = random.choice(valid_locations)
-        for col in valid_locations:
-            row = np.where(board[:, col] == 0)[0][-1]
-            temp_board = board.copy()
-            temp_board[row][col] = 2
-            new_score = minimax(temp_board, depth-1, alpha, beta, False)[1]
-            if new_score > value:
-                value = new_score
-                column = col
-            alpha = max(alpha, value)
-            if alpha >= beta:
-                break
-        return column, value
-
-    else:
-        value = math.inf
-        column = random.choice(valid_locations)
-        for col in valid_locations:
-            row = np.where(board[:, col] == 0)[0][-1]
-            temp_board = board.copy()
-            temp_board[row][col] = 1
-            new_score = minimax(temp_board, depth-1, alpha, beta, True)[1]
-            if new_score < value:
-                value = new_score
-                column = col
-            beta = min(beta, value)
-            if alpha >= beta:
-                break
-        return column, value
-
 # Game loop for AI mode
 def ai_game():
     board = create_board()
+    ai = AIPlayer(AI_TIME_MS, tt=TranspositionTable(), book=open_book(), ponder=PONDER)
     game_over = False
     turn = random.randint(0, 1)
 
     draw_board(board)
 
+    clock = pygame.time.Clock()
+
     while not game_over:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                ai.stop()
                 sys.exit()
 
             if event.type == pygame.MOUSEMOTION and turn == 0:
@@ -189,11 +83,12 @@ def ai_game():
                 posx = event.pos[0]
                 col = int(math.floor(posx / SQUARESIZE))
 
-                if np.any(board[:, col] == 0):
-                    row = np.where(board[:, col] == 0)[0][-1]
-                    board[row][col] = 1
+                if is_valid_location(board, col):
+                    row = get_next_open_row(board, col)
+                    drop_piece(board, row, col, PLAYER_PIECE)
 
-                    if winning_move(board, 1):
+                    if winning_move_at(board, row, col):
+                        ai.stop()
                         label = font.render("Player wins!", True, RED)
                         screen.blit(label, (40, 10))
                         pygame.display.update()
@@ -204,22 +99,30 @@ def ai_game():
                     draw_board(board)
 
         if turn == 1 and not game_over:
-            col, minimax_score = minimax(board, 5, -math.inf, math.inf, True)
+            ai.think(board)
 
-            if np.any(board[:, col] == 0):
-                row = np.where(board[:, col] == 0)[0][-1]
-                board[row][col] = 2
+        result = ai.poll()
+        if result is not None:
+            col, minimax_score, depth = result
 
-                if winning_move(board, 2):
+            if is_valid_location(board, col):
+                row = get_next_open_row(board, col)
+                drop_piece(board, row, col, AI_PIECE)
+
+                if winning_move_at(board, row, col):
                     label = font.render("AI wins!", True, YELLOW)
                     screen.blit(label, (40, 10))
                     pygame.display.update()
                     pygame.time.wait(3000)
                     game_over = True
+                else:
+                    ai.ponder(board)
 
                 turn = 0
                 draw_board(board)
 
+        clock.tick(FPS)
+
 # Main menu
 def main_menu():
     screen.fill(BLACK)
@@ -271,11 +174,11 @@ def two_player_game():
                 posx = event.pos[0]
                 col = int(math.floor(posx / SQUARESIZE))
 
-                if np.any(board[:, col] == 0):
-                    row = np.where(board[:, col] == 0)[0][-1]
-                    board[row][col] = 1 if turn == 0 else 2
+                if is_valid_location(board, col):
+                    row = get_next_open_row(board, col)
+                    drop_piece(board, row, col, PLAYER_PIECE if turn == 0 else AI_PIECE)
 
-                    if winning_move(board, 1 if turn == 0 else 2):
+                    if winning_move_at(board, row, col):
                         label = font.render(f"Player {turn + 1} wins!", True, RED if turn == 0 else YELLOW)
                         screen.blit(label, (40, 10))
                         pygame.display.update()
@@ -0,0 +1,193 @@
+# Parallel root search over a process pool.
+#
+# Young-brothers-wait at the root: the first move in search order (the
+# eldest brother) is searched in this process to get a real alpha, then the
+# remaining root moves, or every (root move, reply) pair with
+# split_depth=2, are handed to the workers. Workers read the best root
+# score found so far from a shared multiprocessing.Value when they start a
+# task, so later tasks search with a tighter window. Each worker keeps its
+# own transposition table between tasks of the same root.
+
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from bitboard import ROW_COUNT, WIN_SCORE, from_moves, has_four
+from search import Searcher, minimax, terminal_value
+from transposition import TranspositionTable
+
+# Per-worker table size; tables are rebuilt for every new root
+WORKER_TABLE_BYTES = 4 * 1024 * 1024
+
+_shared_alpha = None
+_worker_tables = {}
+_worker_root = None
+
+
+def _init_worker(shared_alpha):
+    global _shared_alpha
+    _shared_alpha = shared_alpha
+
+
+def _worker_table(piece, root_key):
+    global _worker_root
+    # A new root may sit at a different ply, where stored depths no longer
+    # line up with a fixed-depth search, so start from an empty table
+    if root_key != _worker_root:
+        _worker_tables.clear()
+        _worker_root = root_key
+    if piece not in _worker_tables:
+        _worker_tables[piece] = TranspositionTable(WORKER_TABLE_BYTES)
+    return _worker_tables[piece]
+
+
+# Score of the root move path (one or two columns) from the root mover's
+# point of view. Values at or below the floor are only upper bounds.
+def _search_path(position, path, depth, piece, root_key):
+    floor = _shared_alpha.value - 1
+    searcher = Searcher(piece, _worker_table(piece, root_key))
+    sign = 1
+    for col in path:
+        mover = position.turn - 1
+        position.play(col)
+        depth -= 1
+        if has_four(position.boards[mover]):
+            return path, sign * WIN_SCORE, searcher.nodes
+        if position.heights[col] == ROW_COUNT and position.is_full():
+            return path, 0, searcher.nodes
+        sign = -sign
+    if sign == 1:
+        value = searcher.negamax(position, depth, floor, math.inf)[1]
+    else:
+        value = -searcher.negamax(position, depth, -math.inf, -floor)[1]
+    return path, value, searcher.nodes
+
+
+class ParallelSearch:
+
+    def __init__(self, workers=None, split_depth=1):
+        self.workers = workers or os.cpu_count() or 1
+        self.split_depth = split_depth
+        self.shared_alpha = multiprocessing.Value("d", -math.inf, lock=False)
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                            initargs=(self.shared_alpha,))
+        self.nodes = 0
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Same (column, value) as search.minimax(position, depth, piece=piece)
+    def search(self, position, depth, piece=None):
+        if piece is None:
+            piece = position.turn
+        value = terminal_value(position, piece)
+        if value is not None:
+            return None, value
+        if depth <= self.split_depth:
+            return minimax(position, depth, piece=piece)
+        sign = 1 if position.turn == piece else -1
+
+        # Eldest brother, searched here
+        searcher = Searcher(piece, TranspositionTable())
+        moves = searcher.order_moves(position, None)
+        first = moves[0]
+        position.play(first)
+        if has_four(position.boards[2 - position.turn]):
+            best_value = WIN_SCORE
+        elif position.is_full():
+            best_value = 0
+        else:
+            best_value = -searcher.negamax(position, depth - 1, -math.inf, math.inf)[1]
+        position.undo()
+        best_column = first
+        self.nodes = searcher.nodes
+        self.shared_alpha.value = best_value
+        if best_value == WIN_SCORE:
+            return best_column, sign * best_value
+
+        # Young brothers, searched by the pool. With split_depth=2 a root
+        # move is done as soon as one reply refutes it; its other replies
+        # are cancelled if they have not started yet.
+        pending = {}
+        children = {}
+        # The pool pickles arguments later, on its own thread, while the
+        # loop below plays on position, so workers get an untouched copy
+        root = position.copy()
+        for col in moves[1:]:
+            paths = [(col,)]
+            if self.split_depth >= 2:
+                position.play(col)
+                if not has_four(position.boards[2 - position.turn]) and not position.is_full():
+                    paths = [(col, reply) for reply in position.valid_moves()]
+                position.undo()
+            futures = [self.executor.submit(_search_path, root, path, depth, piece, root.key)
+                       for path in paths]
+            children[col] = [futures, math.inf]
+            for future in futures:
+                pending[future] = col
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                col = pending.pop(future, None)
+                if col is None or future.cancelled():
+                    continue
+                path, value, nodes = future.result()
+                self.nodes += nodes
+                child = children[col]
+                child[0].remove(future)
+                child[1] = min(child[1], value)
+                value = child[1]
+                if value < best_value or (value == best_value and col > best_column):
+                    for other in child[0]:
+                        other.cancel()
+                        pending.pop(other, None)
+                    child[0] = []
+                elif not child[0]:
+                    best_value = value
+                    best_column = col
+                    self.shared_alpha.value = best_value
+        return best_column, sign * best_value
+
+
+POSITIONS = ["", "4453", "44434333", "4443433344656226", "445332662117"]
+
+
+# Wall-clock speedup of ParallelSearch over search.minimax on POSITIONS
+def speedup_report(workers, depths, positions=POSITIONS):
+    rows = []
+    with ParallelSearch(workers) as parallel:
+        for depth in depths:
+            sequential_time = parallel_time = 0.0
+            for moves in positions:
+                position = from_moves(moves)
+                start = time.perf_counter()
+                expected = minimax(position, depth, tt=TranspositionTable())
+                sequential_time += time.perf_counter() - start
+                start = time.perf_counter()
+                result = parallel.search(position, depth)
+                parallel_time += time.perf_counter() - start
+                if result != expected:
+                    raise AssertionError("%r at depth %d: parallel %r != sequential %r"
+                                         % (moves, depth, result, expected))
+            rows.append((depth, sequential_time, parallel_time))
+    return rows
+
+
+if __name__ == "__main__":
+    worker_count = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    low = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    high = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    print("workers: %d" % worker_count)
+    print("depth  sequential(s)  parallel(s)  speedup")
+    for depth, seq, par in speedup_report(worker_count, range(low, high + 1)):
+        print("%5d  %13.2f  %11.2f  %6.2fx" % (depth, seq, par, seq / par))
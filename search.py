@@ -0,0 +1,593 @@
+# Alpha-beta search over bitboard positions.
+#
+# Positions are played and undone in place, so no board is copied during the
+# search. Results match minimax(board, depth, -math.inf, math.inf, True) from
+# engine.py: the same value, and the leftmost column when several tie.
+
+import math
+import sys
+import time
+
+from bitboard import (COLUMN_COUNT, HEIGHT, ROW_COUNT, WIN_SCORE, from_moves, has_four, make_evaluator, mirror_move,
+                      score_position)
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+MAX_DEPTH = ROW_COUNT * COLUMN_COUNT
+
+# How many nodes pass between two looks at the clock
+CHECK_INTERVAL = 1024
+
+# Columns from the center outwards, the static part of move ordering
+CENTER_ORDER = sorted(range(COLUMN_COUNT), key=lambda c: abs(2 * c - (COLUMN_COUNT - 1)))
+
+# iterative_deepening solves positions with this many empty cells or fewer
+# exactly (see solver.py) before falling back to the heuristic search. At
+# 18 a solve takes about 10 ms on average and well under 0.2 s at worst; at
+# 20 the worst cases pass 1 s, more than a move's budget.
+ENDGAME_CELLS = 18
+
+# Root search drivers: plain alpha-beta, principal variation search (every
+# move after the first gets a null window first and is re-searched only if
+# it beats it) and MTD(f) (a series of null-window searches converging on
+# the value through the transposition table)
+DRIVERS = ("alphabeta", "pvs", "mtdf")
+
+# Half-widths of the aspiration windows tried around the expected root
+# value, one after the other on the side that fails, before the full window
+ASPIRATION_WIDTHS = (16, 64, 256)
+
+HINT_PRIORITY = 1 << 40
+KILLER_PRIORITY = 1 << 39
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def terminal_value(position, piece):
+    if position.is_win(piece):
+        return WIN_SCORE
+    if position.is_win(3 - piece):
+        return -WIN_SCORE
+    if position.is_full():
+        return 0
+    return None
+
+
+def _bound(value, alpha, beta):
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+
+# Negamax form of minimax: values are from the side to move's point of view
+# and piece is the side whose score_position is maximised. A transposition
+# table only holds values for one piece, so keep one table per side.
+# With ordering switched off every node tries its columns left to right.
+# With batch switched on, nodes one ply above the leaves score all their
+# children in a single vector_eval.score_positions call (needs numpy).
+# A stats.SearchStats passed as stats is filled in as the search runs.
+# weights replace bitboard.DEFAULT_WEIGHTS in the evaluation; a table must
+# not be shared between searches with different weights. With pvs switched
+# on every node searches its later moves with a null window first.
+class Searcher:
+
+    def __init__(self, piece, tt=None, deadline=None, ordering=True, batch=False, stop=None, stats=None,
+                 weights=None, pvs=False):
+        self.piece = piece
+        self.tt = tt
+        self.pvs = pvs
+        self.stats = stats
+        self.evaluate = score_position if weights is None else make_evaluator(weights)
+        # time.perf_counter() value after which SearchTimeout is raised
+        self.deadline = deadline
+        # threading.Event (or anything with is_set()) that aborts the search
+        self.stop = stop
+        self.ordering = ordering
+        self.batch = batch
+        if batch:
+            if weights is not None:
+                raise ValueError("batch mode only supports the default weights")
+            import vector_eval
+            self._vector_eval = vector_eval
+        self.nodes = 0
+        # Root searches repeated because the aspiration window failed
+        self.researches = 0
+        # Two killer moves per ply and a history score per (side, cell)
+        self.killers = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        self.history = [[0] * (COLUMN_COUNT * HEIGHT) for _ in range(2)]
+
+    # Hinted move (previous iteration or transposition table) first, then
+    # the killers of this ply, then the rest by history score, center first
+    # among equals
+    def order_moves(self, position, hint):
+        heights = position.heights
+        if not self.ordering:
+            return [c for c in range(COLUMN_COUNT) if heights[c] < ROW_COUNT]
+        killers = self.killers[len(position.moves)]
+        history = self.history[position.turn - 1]
+        scored = []
+        for col in CENTER_ORDER:
+            if heights[col] == ROW_COUNT:
+                continue
+            if col == hint:
+                score = HINT_PRIORITY
+            elif col == killers[0] or col == killers[1]:
+                score = KILLER_PRIORITY
+            else:
+                score = history[col * HEIGHT + heights[col]]
+            scored.append((score, col))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [col for _, col in scored]
+
+    def _record_cutoff(self, position, col, depth):
+        killers = self.killers[len(position.moves)]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        self.history[position.turn - 1][col * HEIGHT + position.heights[col]] += depth * depth
+
+    def negamax(self, position, depth, alpha, beta):
+        self.nodes += 1
+        if not self.nodes % CHECK_INTERVAL:
+            if self.stop is not None and self.stop.is_set():
+                raise SearchTimeout()
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchTimeout()
+        stats = self.stats
+        if stats is not None:
+            stats.nodes_per_ply[len(position.moves) - stats.root_ply] += 1
+
+        if depth == 0:
+            if stats is not None:
+                stats.leaf_evaluations += 1
+            score = self.evaluate(position, self.piece)
+            return None, (score if position.turn == self.piece else -score)
+
+        tt = self.tt
+        hint = None
+        if tt is not None:
+            # A position and its mirror image share one entry
+            key, mirrored = position.canonical_key()
+            entry = tt.probe(key)
+            if stats is not None:
+                stats.tt_probes += 1
+            if entry is not None:
+                entry_depth, entry_value, flag, move = entry
+                if stats is not None:
+                    stats.tt_hits += 1
+                if move >= 0:
+                    hint = mirror_move(move) if mirrored else move
+                if entry_depth >= depth:
+                    if flag == LOWER:
+                        alpha = max(alpha, entry_value)
+                    elif flag == UPPER:
+                        beta = min(beta, entry_value)
+                    if flag == EXACT or alpha >= beta:
+                        if stats is not None:
+                            stats.tt_cutoffs += 1
+                        return hint, entry_value
+        alpha_orig = alpha
+
+        if depth == 1 and self.batch:
+            column, value = self._frontier(position, alpha, beta, hint)
+        else:
+            boards = position.boards
+            heights = position.heights
+            mover = position.turn - 1
+            pvs = self.pvs
+            value = -math.inf
+            column = None
+            moves = self.order_moves(position, hint)
+            for col in moves:
+                position.play(col)
+                if has_four(boards[mover]):
+                    new_score = WIN_SCORE
+                elif heights[col] == ROW_COUNT and position.is_full():
+                    new_score = 0
+                elif pvs and column is not None:
+                    new_score = -self.negamax(position, depth - 1, -alpha - 1, -alpha)[1]
+                    if alpha < new_score < beta:
+                        new_score = -self.negamax(position, depth - 1, -beta, -alpha)[1]
+                else:
+                    new_score = -self.negamax(position, depth - 1, -beta, -alpha)[1]
+                position.undo()
+                if new_score > value:
+                    value = new_score
+                    column = col
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    if self.ordering:
+                        self._record_cutoff(position, col, depth)
+                    if stats is not None:
+                        stats.cutoffs += 1
+                        if col == moves[0]:
+                            stats.first_move_cutoffs += 1
+                    break
+            if stats is not None:
+                stats.expanded += 1
+
+        if tt is not None:
+            tt.store(key, depth, value, _bound(value, alpha_orig, beta),
+                     mirror_move(column) if mirrored and column is not None else column)
+        return column, value
+
+    # Depth-1 node in batch mode: every child that does not end the game is
+    # scored in one call, then the usual alpha-beta loop runs over the
+    # scores so the result is the same as searching the children one by one
+    def _frontier(self, position, alpha, beta, hint):
+        boards = position.boards
+        heights = position.heights
+        mover = position.turn - 1
+        moves = self.order_moves(position, hint)
+        values = []
+        leaves = []
+        for i, col in enumerate(moves):
+            position.play(col)
+            if has_four(boards[mover]):
+                values.append(WIN_SCORE)
+            elif heights[col] == ROW_COUNT and position.is_full():
+                values.append(0)
+            else:
+                values.append(None)
+                leaves.append(i)
+            position.undo()
+        if leaves:
+            children = self._vector_eval.child_boards(position, [moves[i] for i in leaves])
+            scores = self._vector_eval.score_positions(children, self.piece)
+            sign = 1 if position.turn == self.piece else -1
+            for i, score in zip(leaves, scores.tolist()):
+                values[i] = sign * score
+            self.nodes += len(leaves)
+            if self.stats is not None:
+                self.stats.nodes_per_ply[len(position.moves) + 1 - self.stats.root_ply] += len(leaves)
+                self.stats.leaf_evaluations += len(leaves)
+
+        value = -math.inf
+        column = None
+        for col, new_score in zip(moves, values):
+            if new_score > value:
+                value = new_score
+                column = col
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                if self.ordering:
+                    self._record_cutoff(position, col, 1)
+                if self.stats is not None:
+                    self.stats.cutoffs += 1
+                    if col == moves[0]:
+                        self.stats.first_move_cutoffs += 1
+                break
+        if self.stats is not None:
+            self.stats.expanded += 1
+        return column, value
+
+    # Root of the search. Moves may be tried out of column order (the hint or
+    # the best move from the table first), so a column left of the current
+    # best is searched with a window one point lower: a tie is then an exact
+    # score and goes to the leftmost column, as in engine.py.
+    def search_root(self, position, depth, alpha, beta, hint=None):
+        if self.stats is not None:
+            self.stats.root_ply = len(position.moves)
+        if depth == 0:
+            return self.negamax(position, 0, alpha, beta)
+
+        key, mirrored = position.canonical_key()
+        if hint is None and self.tt is not None:
+            entry = self.tt.probe(key)
+            if entry is not None and entry[3] >= 0:
+                hint = mirror_move(entry[3]) if mirrored else entry[3]
+
+        if self.stats is not None:
+            self.stats.nodes_per_ply[0] += 1
+        alpha_orig = alpha
+        boards = position.boards
+        heights = position.heights
+        mover = position.turn - 1
+        value = -math.inf
+        column = None
+        for col in self.order_moves(position, hint):
+            position.play(col)
+            if has_four(boards[mover]):
+                new_score = WIN_SCORE
+            elif heights[col] == ROW_COUNT and position.is_full():
+                new_score = 0
+            else:
+                floor = alpha
+                if column is not None and col < column:
+                    floor = max(alpha_orig, value - 1)
+                if self.pvs and column is not None:
+                    new_score = -self.negamax(position, depth - 1, -floor - 1, -floor)[1]
+                    if floor < new_score < beta:
+                        new_score = -self.negamax(position, depth - 1, -beta, -floor)[1]
+                else:
+                    new_score = -self.negamax(position, depth - 1, -beta, -floor)[1]
+            position.undo()
+            if new_score > value or (new_score == value and col < column):
+                value = new_score
+                column = col
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if self.tt is not None:
+            self.tt.store(key, depth, value, _bound(value, alpha_orig, beta),
+                          mirror_move(column) if mirrored and column is not None else column)
+        return column, value
+
+    # Root search in a narrow window around center. A fail-low or fail-high
+    # widens that side to the next of widths, and finally to infinity.
+    def aspiration(self, position, depth, center, widths=ASPIRATION_WIDTHS, hint=None):
+        steps = list(widths) + [math.inf]
+        low = high = 0
+        while True:
+            alpha = center - steps[low]
+            beta = center + steps[high]
+            column, value = self.search_root(position, depth, alpha, beta, hint)
+            if alpha < value < beta:
+                return column, value
+            self.researches += 1
+            if self.stats is not None:
+                self.stats.researches += 1
+            if value <= alpha:
+                low += 1
+            else:
+                high += 1
+            hint = column
+
+    # MTD(f): null-window root searches starting at guess until the bounds
+    # meet, then one search in a window of three values around the result
+    # to pick the leftmost best column. Needs a transposition table.
+    def mtdf(self, position, depth, guess=0, hint=None):
+        lower = -math.inf
+        upper = math.inf
+        value = guess
+        while lower < upper:
+            beta = value + 1 if value == lower else value
+            hint, value = self.search_root(position, depth, beta - 1, beta, hint)
+            if value < beta:
+                upper = value
+            else:
+                lower = value
+        return self.search_root(position, depth, value - 1, value + 1, hint)
+
+    # Exact value of every legal column at depth, side to move's point of
+    # view, as {column: value}. Each column gets a full window, in the order
+    # given (the rest left to right); the transposition table and the killer
+    # and history tables carry what one column's search learnt to the next.
+    def score_moves(self, position, depth, order=()):
+        if self.stats is not None:
+            self.stats.root_ply = len(position.moves)
+            self.stats.nodes_per_ply[0] += 1
+        boards = position.boards
+        heights = position.heights
+        mover = position.turn - 1
+        columns = list(order) + [c for c in range(COLUMN_COUNT) if c not in order]
+        values = {}
+        for col in columns:
+            if heights[col] == ROW_COUNT:
+                continue
+            position.play(col)
+            if has_four(boards[mover]):
+                values[col] = WIN_SCORE
+            elif heights[col] == ROW_COUNT and position.is_full():
+                values[col] = 0
+            else:
+                values[col] = -self.negamax(position, depth - 1, -math.inf, math.inf)[1]
+            position.undo()
+        return values
+
+    # Best moves stored in the table from the position after col onwards,
+    # at most length moves in all
+    def principal_variation(self, position, col, length):
+        ply = len(position.moves)
+        pv = [col]
+        position.play(col)
+        while len(pv) < length and terminal_value(position, position.turn) is None:
+            key, mirrored = position.canonical_key()
+            entry = self.tt.probe(key) if self.tt is not None else None
+            if entry is None or entry[3] < 0:
+                break
+            move = mirror_move(entry[3]) if mirrored else entry[3]
+            if not position.can_play(move):
+                break
+            pv.append(move)
+            position.play(move)
+        while len(position.moves) > ply:
+            position.undo()
+        return pv
+
+
+# Drop-in replacement for minimax(board, depth, alpha, beta, True) in engine.py.
+# The side to move maximises unless piece says otherwise. Pass the same
+# transposition table on every turn of a game to reuse earlier searches.
+# driver is one of DRIVERS, all of which give the same result; MTD(f)
+# ignores alpha and beta, starts from guess and brings its own table if
+# none is passed.
+def minimax(position, depth, alpha=-math.inf, beta=math.inf, piece=None, tt=None, ordering=True,
+            batch=False, stats=None, weights=None, driver="alphabeta", guess=0):
+    if driver not in DRIVERS:
+        raise ValueError("unknown search driver %r" % driver)
+    if piece is None:
+        piece = position.turn
+    value = terminal_value(position, piece)
+    if value is not None:
+        return None, value
+    if tt is None and driver == "mtdf":
+        tt = TranspositionTable()
+    if tt is not None:
+        tt.new_search()
+    searcher = Searcher(piece, tt, ordering=ordering, batch=batch, stats=stats, weights=weights,
+                        pvs=driver == "pvs")
+    if stats is not None:
+        stats.start_iteration()
+    if driver == "mtdf":
+        column, value = searcher.mtdf(position, depth, guess if position.turn == piece else -guess)
+        if position.turn != piece:
+            value = -value
+    elif position.turn == piece:
+        column, value = searcher.search_root(position, depth, alpha, beta)
+    else:
+        column, value = searcher.search_root(position, depth, -beta, -alpha)
+        value = -value
+    if stats is not None:
+        stats.end_iteration(depth, column, value)
+    return column, value
+
+
+# Search depth 1, 2, 3, ... until time_ms milliseconds have passed and return
+# (column, value, depth) from the deepest iteration that finished. Depth 1
+# always runs to completion so there is a move even on a tiny budget, unless
+# the stop event is set first, in which case the result is None. Positions
+# found in the opening book (book.OpeningBook) are answered without a search.
+# With endgame_cells or fewer empty cells the solver gets the first half of
+# the budget; the depth of a solved position is its number of empty cells.
+# MTD(f) starts every iteration from the value of the one before; the other
+# drivers search it in aspiration windows of the given widths (None for the
+# full window). guess, the value of the last search of the game if known,
+# seeds the first iteration.
+def iterative_deepening(position, time_ms, piece=None, tt=None, max_depth=MAX_DEPTH, stop=None, stats=None,
+                        book=None, endgame_cells=ENDGAME_CELLS, weights=None, driver="alphabeta", guess=None,
+                        aspiration=ASPIRATION_WIDTHS):
+    if driver not in DRIVERS:
+        raise ValueError("unknown search driver %r" % driver)
+    if piece is None:
+        piece = position.turn
+    value = terminal_value(position, piece)
+    if value is not None:
+        return None, value, 0
+    # Book scores are for the side to move
+    if book is not None and piece == position.turn:
+        entry = book.probe(position)
+        if entry is not None:
+            return entry[0], entry[1], book.depth
+    sign = 1 if position.turn == piece else -1
+    empty = MAX_DEPTH - sum(position.heights)
+    start = time.perf_counter()
+    deadline = start + time_ms / 1000.0
+    if empty <= endgame_cells:
+        from solver import Solver, search_value
+        solver = Solver(deadline=start + time_ms / 2000.0, stop=stop)
+        try:
+            column, score = solver.best_move(position)
+            return column, sign * search_value(score), empty
+        except SearchTimeout:
+            if stop is not None and stop.is_set():
+                return None
+
+    if tt is None:
+        tt = TranspositionTable()
+    tt.new_search()
+    searcher = Searcher(piece, tt, stop=stop, stats=stats, weights=weights, pvs=driver == "pvs")
+    ply = len(position.moves)
+    best = None
+    # Expected root value, side to move's point of view
+    value = None if guess is None else sign * guess
+    for depth in range(1, min(max_depth, empty) + 1):
+        if stats is not None:
+            stats.start_iteration()
+        try:
+            if driver == "mtdf":
+                column, value = searcher.mtdf(position, depth, value or 0, best[0] if best else None)
+            elif aspiration and value is not None:
+                column, value = searcher.aspiration(position, depth, value, aspiration,
+                                                    best[0] if best else None)
+            else:
+                column, value = searcher.search_root(position, depth, -math.inf, math.inf,
+                                                     best[0] if best else None)
+        except SearchTimeout:
+            while len(position.moves) > ply:
+                position.undo()
+            break
+        best = (column, sign * value, depth)
+        if stats is not None:
+            stats.end_iteration(depth, column, sign * value)
+        searcher.deadline = deadline
+        if abs(value) == WIN_SCORE or time.perf_counter() >= deadline:
+            break
+        if stop is not None and stop.is_set():
+            break
+    return best
+
+
+# Every legal column with its value for the side to move and principal
+# variation, as a list of (column, value, pv) from the best column to the
+# worst (the leftmost first among equals), and the depth it was searched
+# to. Give a depth, a time budget in milliseconds or both; with a budget
+# the depths run 1, 2, 3, ... as in iterative_deepening and the deepest
+# one that finished is returned (depth 1 always finishes unless the stop
+# event is set, in which case the result is None). One table serves every
+# column and depth, so the columns share their work instead of being seven
+# separate searches. The first line agrees with minimax at that depth.
+def analyse(position, depth=None, time_ms=None, tt=None, stop=None, stats=None, weights=None):
+    if depth is None and time_ms is None:
+        raise ValueError("analyse needs a depth or a time budget")
+    if terminal_value(position, position.turn) is not None:
+        return [], 0
+    empty = MAX_DEPTH - sum(position.heights)
+    max_depth = min(depth or MAX_DEPTH, empty)
+    first = max_depth if time_ms is None else 1
+    deadline = None if time_ms is None else time.perf_counter() + time_ms / 1000.0
+    if tt is None:
+        tt = TranspositionTable()
+    tt.new_search()
+    searcher = Searcher(position.turn, tt, stop=stop, stats=stats, weights=weights)
+    ply = len(position.moves)
+    best = None
+    order = ()
+    for current in range(first, max_depth + 1):
+        if stats is not None:
+            stats.start_iteration()
+        try:
+            values = searcher.score_moves(position, current, order)
+        except SearchTimeout:
+            while len(position.moves) > ply:
+                position.undo()
+            break
+        order = sorted(values, key=lambda c: (-values[c], c))
+        best = ([(c, values[c], searcher.principal_variation(position, c, current)) for c in order], current)
+        if stats is not None:
+            stats.end_iteration(current, order[0], values[order[0]])
+        searcher.deadline = deadline
+        if all(abs(v) == WIN_SCORE for v in values.values()):
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        if stop is not None and stop.is_set():
+            break
+    return best
+
+
+# Nodes searched for every AI move of a recorded game, with move ordering
+# on and off. Both runs must agree on the move and its value.
+def ordering_report(moves, depth, piece=2):
+    position = from_moves("")
+    rows = []
+    for ply in range(len(moves) + 1):
+        if position.turn == piece and terminal_value(position, piece) is None:
+            counts = []
+            results = []
+            for ordering in (True, False):
+                searcher = Searcher(piece, ordering=ordering)
+                results.append(searcher.search_root(position, depth, -math.inf, math.inf))
+                counts.append(searcher.nodes)
+            if results[0] != results[1]:
+                raise AssertionError("ordering changed the result: %r != %r" % tuple(results))
+            rows.append((ply, results[0][0], results[0][1], counts[0], counts[1]))
+        if ply < len(moves):
+            position.play(int(moves[ply]) - 1)
+    return rows
+
+
+if __name__ == "__main__":
+    game = sys.argv[1] if len(sys.argv) > 1 else "44434333446562261"
+    search_depth = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    total_on = total_off = 0
+    print("ply  col       value   nodes(on)  nodes(off)")
+    for ply, col, value, on, off in ordering_report(game, search_depth):
+        total_on += on
+        total_off += off
+        print("%3d  %3d  %10d  %10d  %10d" % (ply, col, value, on, off))
+    print("total           %10d  %10d  (%.1fx fewer)" % (total_on, total_off, total_off / max(total_on, 1)))
@@ -0,0 +1,206 @@
+# HTTP/JSON service that answers AI moves, standard library only.
+#
+# Searches run on a pool of worker processes started (and warmed up) with
+# the service. Each worker keeps its transposition tables and the opening
+# book open between requests, so later searches reuse earlier ones. The
+# asyncio front end only parses requests and waits; identical requests
+# that arrive while one is being searched share its result.
+#
+#     POST /move   {"moves": "4453", "time_ms": 200}
+#                  -> {"column": 4, "value": 17, "depth": 9}
+#     GET  /stats  -> requests served, queue depth, latency percentiles
+#
+# Columns are 1-based as in the move strings, values are for the side to
+# move and column is null when the game is already over.
+#
+#     python server.py --port 8765 --workers 2
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import from_moves
+from book import open_book
+from search import iterative_deepening
+from transposition import TranspositionTable
+
+DEFAULT_TIME_MS = 500
+MAX_TIME_MS = 10000
+
+# Per-side table size of every worker
+SERVER_TABLE_BYTES = 32 * 1024 * 1024
+
+# Latencies kept for the percentiles
+LATENCY_WINDOW = 1000
+
+# Largest request body accepted
+MAX_BODY = 4096
+
+_worker_tables = None
+_worker_book = None
+
+
+def _init_worker():
+    global _worker_tables, _worker_book
+    # One table per side to move, see search.Searcher
+    _worker_tables = {1: TranspositionTable(SERVER_TABLE_BYTES), 2: TranspositionTable(SERVER_TABLE_BYTES)}
+    _worker_book = open_book()
+
+
+def _search(moves, time_ms):
+    position = from_moves(moves)
+    result = iterative_deepening(position, time_ms, tt=_worker_tables[position.turn], book=_worker_book)
+    column, value, depth = result
+    return None if column is None else column + 1, value, depth
+
+
+# The p-th percentile (0-100) of sorted values, nearest rank
+def percentile(values, p):
+    if not values:
+        return 0.0
+    rank = max(int(round(p / 100.0 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class MoveService:
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        # (moves, time_ms) -> future of the search in progress
+        self.in_flight = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.searches = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    # Start every worker and run a tiny search on each so the first real
+    # request does not pay for process start-up and imports
+    async def warm_up(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _search, "", 1)
+                               for _ in range(self.workers)))
+
+    def close(self):
+        self.executor.shutdown()
+
+    async def best_move(self, moves, time_ms):
+        key = (moves, time_ms)
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, _search, moves, time_ms)
+        self.in_flight[key] = future
+        self.searches += 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "searches": self.searches,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "workers": self.workers,
+            # Distinct searches waiting for or running on a worker
+            "queue_depth": len(self.in_flight),
+            "latency_ms": {
+                "p50": percentile(latencies, 50) * 1000,
+                "p90": percentile(latencies, 90) * 1000,
+                "p99": percentile(latencies, 99) * 1000,
+                "max": latencies[-1] * 1000 if latencies else 0.0,
+            },
+        }
+
+    # (status, body) of one request
+    async def dispatch(self, method, path, body):
+        if path == "/stats" and method == "GET":
+            return 200, self.stats()
+        if path != "/move":
+            return 404, {"error": "not found"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            request = json.loads(body or b"{}")
+            moves = str(request.get("moves", ""))
+            time_ms = int(request.get("time_ms", DEFAULT_TIME_MS))
+            from_moves(moves)
+        except (ValueError, TypeError, AttributeError) as e:
+            return 400, {"error": str(e)}
+        if not 0 < time_ms <= MAX_TIME_MS:
+            return 400, {"error": "time_ms must be between 1 and %d" % MAX_TIME_MS}
+        start = time.perf_counter()
+        column, value, depth = await self.best_move(moves, time_ms)
+        self.latencies.append(time.perf_counter() - start)
+        return 200, {"column": column, "value": value, "depth": depth}
+
+    # One request per connection
+    async def handle(self, reader, writer):
+        try:
+            try:
+                request_line = await reader.readline()
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                if length > MAX_BODY:
+                    raise ValueError("request body too large")
+                body = await reader.readexactly(length) if length else b""
+            except (ValueError, asyncio.IncompleteReadError):
+                status, payload = 400, {"error": "malformed request"}
+            else:
+                self.requests += 1
+                status, payload = await self.dispatch(method, path.split("?", 1)[0], body)
+            if status >= 400:
+                self.errors += 1
+            data = json.dumps(payload).encode()
+            writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n"
+                         b"Connection: close\r\n\r\n" % (status, _REASONS[status], len(data)) + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+_REASONS = {200: b"OK", 400: b"Bad Request", 404: b"Not Found", 405: b"Method Not Allowed"}
+
+
+async def serve(host, port, workers=None):
+    service = MoveService(workers)
+    try:
+        await service.warm_up()
+        server = await asyncio.start_server(service.handle, host, port)
+        print("serving on %s:%d with %d workers" % (host, port, service.workers))
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve AI moves over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
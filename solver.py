@@ -0,0 +1,195 @@
+# Exact solver for positions with few empty cells left.
+#
+# Scores count the distance to the end of the game: a win with the k-th
+# stone of the side to move scores (CELLS + 1 - moves) // 2 from the
+# position where moves stones are down, so faster wins score higher and
+# slower losses score less negative. 0 is a draw. The search is a negamax
+# over two integers per position, the stones of the side to move and the
+# mask of all stones, with null-window probes narrowing the score down and a
+# transposition table of bounds.
+#
+#     python solver.py [moves]
+
+import sys
+import time
+
+from bitboard import COLUMN_COUNT, HEIGHT, ROW_COUNT, WIN_SCORE, from_moves, popcount
+from search import CENTER_ORDER, CHECK_INTERVAL, SearchTimeout
+from transposition import LOWER, UPPER, TranspositionTable
+
+CELLS = ROW_COUNT * COLUMN_COUNT
+
+BOTTOM_MASK = sum(1 << (col * HEIGHT) for col in range(COLUMN_COUNT))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROW_COUNT) - 1)
+COLUMN_MASKS = [((1 << ROW_COUNT) - 1) << (col * HEIGHT) for col in range(COLUMN_COUNT)]
+
+
+# Empty cells that would give stones a four
+def winning_cells(stones, mask):
+    # Vertical
+    r = (stones << 1) & (stones << 2) & (stones << 3)
+    for shift in (HEIGHT, HEIGHT - 1, HEIGHT + 1):
+        pair = (stones << shift) & (stones << 2 * shift)
+        r |= pair & (stones << 3 * shift)
+        r |= pair & (stones >> shift)
+        pair = (stones >> shift) & (stones >> 2 * shift)
+        r |= pair & (stones << shift)
+        r |= pair & (stones >> 3 * shift)
+    return r & (BOARD_MASK ^ mask)
+
+
+# Cells the side to move can play without handing the opponent an
+# immediate win; 0 when every move loses
+def non_losing_moves(current, mask):
+    possible = (mask + BOTTOM_MASK) & BOARD_MASK
+    threats = winning_cells(current ^ mask, mask)
+    forced = possible & threats
+    if forced:
+        if forced & (forced - 1):
+            return 0
+        possible = forced
+    return possible & ~(threats >> 1)
+
+
+def can_win_next(current, mask):
+    return winning_cells(current, mask) & (mask + BOTTOM_MASK) & BOARD_MASK != 0
+
+
+class Solver:
+
+    def __init__(self, tt=None, deadline=None, stop=None):
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.deadline = deadline
+        self.stop = stop
+        self.nodes = 0
+
+    # Score of a position where the side to move cannot win at once, as
+    # seen through the (alpha, beta) window
+    def negamax(self, current, mask, moves, alpha, beta):
+        self.nodes += 1
+        if not self.nodes % CHECK_INTERVAL:
+            if self.stop is not None and self.stop.is_set():
+                raise SearchTimeout()
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchTimeout()
+
+        playable = non_losing_moves(current, mask)
+        if not playable:
+            return -((CELLS - moves) // 2)
+        if moves >= CELLS - 2:
+            return 0
+
+        # The opponent cannot win with their next stone, nor can we
+        low = -((CELLS - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        high = (CELLS - 1 - moves) // 2
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        # current + mask identifies the position and fits in 64 bits
+        key = current + mask
+        entry = self.tt.probe(key)
+        if entry is not None:
+            _, value, flag, _ = entry
+            if flag == LOWER:
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        return alpha
+            elif value < beta:
+                beta = value
+                if alpha >= beta:
+                    return beta
+
+        # Moves that set up the most new threats first, center first among equals
+        ordered = []
+        for col in CENTER_ORDER:
+            move = playable & COLUMN_MASKS[col]
+            if move:
+                ordered.append((popcount(winning_cells(current | move, mask)), len(ordered), move))
+        ordered.sort(reverse=True)
+
+        opponent = current ^ mask
+        for _, _, move in ordered:
+            score = -self.negamax(opponent, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self.tt.store(key, 0, score, LOWER, None)
+                return score
+            if score > alpha:
+                alpha = score
+        self.tt.store(key, 0, alpha, UPPER, None)
+        return alpha
+
+    # Exact score of the position, side to move's point of view
+    def solve(self, current, mask, moves):
+        if can_win_next(current, mask):
+            return (CELLS + 1 - moves) // 2
+        low = -((CELLS - moves) // 2)
+        high = (CELLS + 1 - moves) // 2
+        while low < high:
+            med = low + (high - low) // 2
+            if med <= 0 and int(low / 2) < med:
+                med = int(low / 2)
+            elif med >= 0 and int(high / 2) > med:
+                med = int(high / 2)
+            score = self.negamax(current, mask, moves, med, med + 1)
+            if score <= med:
+                high = score
+            else:
+                low = score
+        return low
+
+    # (column, score) of the best move for a bitboard.Position that is not
+    # over yet, the leftmost column among equal scores
+    def best_move(self, position):
+        current = position.boards[position.turn - 1]
+        mask = position.boards[0] | position.boards[1]
+        moves = popcount(mask)
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        wins = winning_cells(current, mask) & possible
+        if wins:
+            for col in range(COLUMN_COUNT):
+                if wins & COLUMN_MASKS[col]:
+                    return col, (CELLS + 1 - moves) // 2
+        score = self.solve(current, mask, moves)
+        # Every move loses at once: any column will do
+        playable = non_losing_moves(current, mask) or possible
+        opponent = current ^ mask
+        for col in range(COLUMN_COUNT):
+            move = playable & COLUMN_MASKS[col]
+            if not move:
+                continue
+            if moves + 1 == CELLS:
+                return col, 0
+            if can_win_next(opponent, mask | move):
+                if score == -((CELLS - moves) // 2):
+                    return col, score
+                continue
+            # One null-window probe: does this move keep the score?
+            if -self.negamax(opponent, mask | move, moves + 1, -score, -score + 1) >= score:
+                return col, score
+        return None
+
+# Search value (WIN_SCORE, -WIN_SCORE or 0) of a solver score
+def search_value(score):
+    if score > 0:
+        return WIN_SCORE
+    if score < 0:
+        return -WIN_SCORE
+    return 0
+
+
+if __name__ == "__main__":
+    game = sys.argv[1] if len(sys.argv) > 1 else "4453535433322277772265"
+    start = time.perf_counter()
+    solver = Solver()
+    column, result = solver.best_move(from_moves(game))
+    elapsed = time.perf_counter() - start
+    print("empty cells: %d" % (CELLS - len(game)))
+    print("best column: %d, score: %d" % (column + 1, result))
+    print("%d nodes in %.3fs" % (solver.nodes, elapsed))
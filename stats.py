@@ -0,0 +1,102 @@
+# Counters filled in by the search when a SearchStats is passed to
+# search.minimax, search.iterative_deepening or a Searcher.
+#
+# Without one the search only tests "stats is not None" at a few places, so
+# leaving it off costs next to nothing. on_iteration, if given, is called
+# with (stats, iteration) each time an iterative deepening depth finishes.
+
+import sys
+import time
+
+MAX_PLY = 42
+
+
+class SearchStats:
+
+    def __init__(self, on_iteration=None):
+        self.on_iteration = on_iteration
+        self.reset()
+
+    def reset(self):
+        # Ply of the root, so nodes_per_ply[0] is the root itself
+        self.root_ply = 0
+        self.nodes_per_ply = [0] * (MAX_PLY + 1)
+        self.leaf_evaluations = 0
+        # Nodes that tried at least one move, and how many of those failed high
+        self.expanded = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        # Root searches repeated after an aspiration window failed
+        self.researches = 0
+        self.iterations = []
+        self._start = None
+
+    def nodes(self):
+        return sum(self.nodes_per_ply)
+
+    def beta_cutoff_rate(self):
+        return self.cutoffs / self.expanded if self.expanded else 0.0
+
+    # Share of cutoffs caused by the first move tried, a measure of ordering
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def start_iteration(self):
+        self._start = time.perf_counter()
+
+    # seconds is the time of this iteration alone, nodes the total so far
+    def end_iteration(self, depth, column, value):
+        iteration = {
+            "depth": depth,
+            "seconds": time.perf_counter() - self._start,
+            "nodes": self.nodes(),
+            "column": column,
+            "value": value,
+        }
+        self.iterations.append(iteration)
+        if self.on_iteration is not None:
+            self.on_iteration(self, iteration)
+
+    def as_dict(self):
+        last = len(self.nodes_per_ply)
+        while last > 1 and not self.nodes_per_ply[last - 1]:
+            last -= 1
+        return {
+            "nodes": self.nodes(),
+            "nodes_per_ply": self.nodes_per_ply[:last],
+            "leaf_evaluations": self.leaf_evaluations,
+            "beta_cutoff_rate": self.beta_cutoff_rate(),
+            "first_move_cutoff_rate": self.first_move_cutoff_rate(),
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_cutoffs": self.tt_cutoffs,
+            "researches": self.researches,
+            "iterations": self.iterations,
+        }
+
+
+if __name__ == "__main__":
+    from bitboard import from_moves
+    from search import iterative_deepening
+
+    game = sys.argv[1] if len(sys.argv) > 1 else "44434333"
+    budget = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    def report(stats, iteration):
+        print("depth %2d  %8.3fs  %9d nodes  col %s  value %d" % (
+            iteration["depth"], iteration["seconds"], iteration["nodes"], iteration["column"],
+            iteration["value"]))
+
+    search_stats = SearchStats(on_iteration=report)
+    iterative_deepening(from_moves(game), budget, stats=search_stats)
+    summary = search_stats.as_dict()
+    print("nodes per ply:", summary["nodes_per_ply"])
+    print("leaf evaluations: %d" % summary["leaf_evaluations"])
+    print("beta cutoff rate: %.1f%%, first move: %.1f%%" % (
+        100 * summary["beta_cutoff_rate"], 100 * summary["first_move_cutoff_rate"]))
+    print("tt probes: %d, hits: %d, cutoffs: %d" % (
+        summary["tt_probes"], summary["tt_hits"], summary["tt_cutoffs"]))
+    print("aspiration re-searches: %d" % summary["researches"])
@@ -0,0 +1,127 @@
+# Transposition table for the bitboard search.
+#
+# Entries live in fixed-size arrays so the table never grows past its memory
+# cap. Each bucket has two slots: a depth-preferred slot that only gives way
+# to an equal or deeper search (or to anything once the entry is from an
+# older search), and an always-replace slot that takes everything else.
+
+from array import array
+
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+# key (8) + value (8) + depth, flag, move and age (1 each)
+ENTRY_BYTES = 20
+
+DEFAULT_MEMORY = 16 * 1024 * 1024
+
+
+class TranspositionTable:
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY):
+        buckets = 1
+        while buckets * 4 * ENTRY_BYTES <= max_bytes:
+            buckets *= 2
+        self.mask = buckets - 1
+        size = buckets * 2
+        self.keys = array("Q", bytes(8 * size))
+        self.values = array("q", bytes(8 * size))
+        self.depths = array("b", bytes(size))
+        self.flags = array("b", bytes(size))
+        self.best_moves = array("b", bytes(size))
+        self.ages = array("B", bytes(size))
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def __len__(self):
+        return sum(1 for flag in self.flags if flag)
+
+    def capacity(self):
+        return len(self.keys)
+
+    def memory(self):
+        return self.capacity() * ENTRY_BYTES
+
+    # Called once per root search so older entries lose their claim to the
+    # depth-preferred slot without being thrown away
+    def new_search(self):
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        size = self.capacity()
+        self.keys = array("Q", bytes(8 * size))
+        self.values = array("q", bytes(8 * size))
+        self.depths = array("b", bytes(size))
+        self.flags = array("b", bytes(size))
+        self.best_moves = array("b", bytes(size))
+        self.ages = array("B", bytes(size))
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "hit_rate": self.hits / probes if probes else 0.0,
+        }
+
+    # Returns (depth, value, flag, move) or None
+    def probe(self, key):
+        slot = (key & self.mask) << 1
+        flags = self.flags
+        keys = self.keys
+        for i in (slot, slot + 1):
+            if flags[i] and keys[i] == key:
+                self.hits += 1
+                return self.depths[i], self.values[i], flags[i], self.best_moves[i]
+        self.misses += 1
+        if flags[slot] or flags[slot + 1]:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, value, flag, move):
+        slot = (key & self.mask) << 1
+        keys = self.keys
+        flags = self.flags
+        self.stores += 1
+        if move is None:
+            move = -1
+        if flags[slot] and keys[slot] != key:
+            if self.ages[slot] == self.age and self.depths[slot] > depth:
+                # Keep the deeper entry, use the always-replace slot
+                self._write(slot + 1, key, depth, value, flag, move)
+                return
+            # Demote the old depth-preferred entry instead of dropping it
+            self._copy(slot, slot + 1)
+        elif flags[slot + 1] and keys[slot + 1] == key:
+            flags[slot + 1] = 0
+        self._write(slot, key, depth, value, flag, move)
+
+    def _write(self, i, key, depth, value, flag, move):
+        self.keys[i] = key
+        self.values[i] = value
+        self.depths[i] = depth
+        self.flags[i] = flag
+        self.best_moves[i] = move
+        self.ages[i] = self.age
+
+    def _copy(self, src, dst):
+        self.keys[dst] = self.keys[src]
+        self.values[dst] = self.values[src]
+        self.depths[dst] = self.depths[src]
+        self.flags[dst] = self.flags[src]
+        self.best_moves[dst] = self.best_moves[src]
+        self.ages[dst] = self.ages[src]
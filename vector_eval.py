@@ -0,0 +1,173 @@
+# score_position for numpy boards, computed with a few array operations.
+#
+# Every four-cell window is a row of WINDOW_INDEX (flat indices into the
+# 6x7 board), so one fancy-indexing gather gives all 69 windows at once and
+# WINDOW_TABLE turns the per-window counts into the evaluate_window score.
+# score_positions does the same for a whole (N, 6, 7) stack in one call.
+
+import random
+import sys
+import timeit
+
+import numpy as np
+
+from bitboard import HEIGHT
+
+ROW_COUNT = 6
+COLUMN_COUNT = 7
+
+
+def _window_index():
+    windows = []
+    # Horizontal
+    for r in range(ROW_COUNT):
+        for c in range(COLUMN_COUNT - 3):
+            windows.append([r * COLUMN_COUNT + c + i for i in range(4)])
+    # Vertical
+    for c in range(COLUMN_COUNT):
+        for r in range(ROW_COUNT - 3):
+            windows.append([(r + i) * COLUMN_COUNT + c for i in range(4)])
+    # Positive diagonal
+    for r in range(3, ROW_COUNT):
+        for c in range(COLUMN_COUNT - 3):
+            windows.append([(r - i) * COLUMN_COUNT + c + i for i in range(4)])
+    # Negative diagonal
+    for r in range(3, ROW_COUNT):
+        for c in range(3, COLUMN_COUNT):
+            windows.append([(r - i) * COLUMN_COUNT + c - i for i in range(4)])
+    return np.array(windows, dtype=np.intp)
+
+
+WINDOW_INDEX = _window_index()
+CENTER_INDEX = np.arange(ROW_COUNT) * COLUMN_COUNT + COLUMN_COUNT // 2
+
+
+# evaluate_window score indexed by (own count, empty count, opponent count)
+def _window_table():
+    table = np.zeros((5, 5, 5), dtype=np.int64)
+    for own in range(5):
+        for empty in range(5 - own):
+            opp = 4 - own - empty
+            score = 0
+            if own == 4:
+                score += 100
+            elif own == 3 and empty == 1:
+                score += 5
+            elif own == 2 and empty == 2:
+                score += 2
+            if opp == 3 and empty == 1:
+                score -= 4
+            table[own, empty, opp] = score
+    return table
+
+
+WINDOW_TABLE = _window_table()
+
+
+def score_position(board, piece):
+    cells = np.asarray(board).reshape(-1)
+    windows = cells[WINDOW_INDEX]
+    own = np.count_nonzero(windows == piece, axis=1)
+    empty = np.count_nonzero(windows == 0, axis=1)
+    score = WINDOW_TABLE[own, empty, 4 - own - empty].sum()
+    score += np.count_nonzero(cells[CENTER_INDEX] == piece) * 6
+    return int(score)
+
+
+# WINDOW_TABLE keyed by the base-3 code of a window's four cells
+# (cell0 + 3 * cell1 + 9 * cell2 + 27 * cell3), one row per piece
+def _window_code_table():
+    table = np.zeros((3, 81), dtype=np.int64)
+    for code in range(81):
+        cells = [code // 3 ** i % 3 for i in range(4)]
+        empty = cells.count(0)
+        for piece in (1, 2):
+            own = cells.count(piece)
+            table[piece, code] = WINDOW_TABLE[own, empty, 4 - own - empty]
+    return table
+
+
+WINDOW_CODE_TABLE = _window_code_table()
+WINDOW_COLUMNS = [WINDOW_INDEX[:, i] for i in range(4)]
+
+
+# Scores of an (N, 6, 7) stack of boards as an array of N ints
+def score_positions(boards, piece):
+    boards = np.asarray(boards)
+    cells = boards.reshape(len(boards), -1).astype(np.intp)
+    first, second, third, fourth = WINDOW_COLUMNS
+    codes = cells[:, first] + 3 * cells[:, second] + 9 * cells[:, third] + 27 * cells[:, fourth]
+    scores = WINDOW_CODE_TABLE[piece][codes].sum(axis=1)
+    scores += np.count_nonzero(cells[:, CENTER_INDEX] == piece, axis=1) * 6
+    return scores
+
+
+# Bit of a bitboard.Position behind every cell of a numpy board
+CELL_SHIFTS = np.array([[c * HEIGHT + ROW_COUNT - 1 - r for c in range(COLUMN_COUNT)]
+                        for r in range(ROW_COUNT)], dtype=np.uint64)
+
+
+def board_from_position(position):
+    player = np.uint64(position.boards[0])
+    ai = np.uint64(position.boards[1])
+    one = np.uint64(1)
+    board = ((player >> CELL_SHIFTS) & one) + 2 * ((ai >> CELL_SHIFTS) & one)
+    return board.astype(np.int8)
+
+
+# Boards after each of moves is played from position, as an (N, 6, 7) stack
+def child_boards(position, moves):
+    parent = board_from_position(position)
+    children = np.repeat(parent[np.newaxis], len(moves), axis=0)
+    rows = [ROW_COUNT - 1 - position.heights[col] for col in moves]
+    children[np.arange(len(moves)), rows, moves] = position.turn
+    return children
+
+
+# Boards of engine.py (float64, row 0 on top) with random
+# legal drops, seeded so every run times the same positions
+def random_boards(count, seed=0):
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = np.zeros((ROW_COUNT, COLUMN_COUNT))
+        heights = [0] * COLUMN_COUNT
+        piece = 1
+        for _ in range(rng.randint(0, ROW_COUNT * COLUMN_COUNT)):
+            col = rng.choice([c for c in range(COLUMN_COUNT) if heights[c] < ROW_COUNT])
+            board[ROW_COUNT - 1 - heights[col]][col] = piece
+            heights[col] += 1
+            piece = 3 - piece
+        boards.append(board)
+    return boards
+
+
+# Microbenchmark against score_position from engine.py
+def benchmark(count=200, repeat=5):
+    from engine import score_position as reference
+
+    boards = random_boards(count)
+    for board in boards:
+        for piece in (1, 2):
+            if reference(board, piece) != score_position(board, piece):
+                raise AssertionError("score mismatch on board\n%s" % board)
+
+    stack = np.array(boards)
+    if list(score_positions(stack, 2)) != [reference(board, 2) for board in boards]:
+        raise AssertionError("batched scores differ from score_position")
+
+    results = {}
+    for name, func in (("score_position (engine)", reference), ("score_position (vector_eval)", score_position)):
+        best = min(timeit.repeat(lambda: [func(board, 2) for board in boards], number=1, repeat=repeat))
+        results[name] = best / count
+    best = min(timeit.repeat(lambda: score_positions(stack, 2), number=1, repeat=repeat))
+    results["score_positions (batched)"] = best / count
+    return results
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    timings = benchmark(n)
+    base = timings["score_position (engine)"]
+    for name, per_call in timings.items():
+        print("%-30s %8.1f us/call  %5.1fx" % (name, per_call * 1e6, base / per_call))